@@ -0,0 +1,81 @@
+import time
+import asyncio
+import functools
+import database
+import metrics
+
+from concurrent.futures import ThreadPoolExecutor
+
+# async facade over database.py so the event loop never waits on SQLite.
+# writes are serialised on one dedicated thread (they share one connection anyway),
+# reads run on a pool sized to match database.READ_POOL_SIZE
+_write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+_read_executor = ThreadPoolExecutor(max_workers=database.READ_POOL_SIZE, thread_name_prefix="db-reader")
+
+# both decorators time the whole call as the event loop sees it, executor queueing included
+def _writes(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(_write_executor, functools.partial(func, *args, **kwargs))
+        finally:
+            metrics.db_seconds.observe(time.perf_counter() - start, func.__name__)
+    return wrapper
+
+def _reads(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(_read_executor, functools.partial(func, *args, **kwargs))
+        finally:
+            metrics.db_seconds.observe(time.perf_counter() - start, func.__name__)
+    return wrapper
+
+def shutdown():
+    _write_executor.shutdown(wait=True)
+    _read_executor.shutdown(wait=True)
+    database.close_connections()
+
+# posted articles, article log & deliveries
+stage_articles = _writes(database.stage_articles)
+save_deliveries = _writes(database.save_deliveries)
+register_consumer = _writes(database.register_consumer)
+get_log_entries = _reads(database.get_log_entries)
+advance_consumer = _writes(database.advance_consumer)
+get_deliveries = _reads(database.get_deliveries)
+filter_new_links = _reads(database.filter_new_links)
+prune_posted_articles = _writes(database.prune_posted_articles)
+
+# leader election
+acquire_lease = _writes(database.acquire_lease)
+release_lease = _writes(database.release_lease)
+
+# news source schedules
+save_source_schedules = _writes(database.save_source_schedules)
+get_source_schedules = _reads(database.get_source_schedules)
+
+# bot-wide meta values
+set_meta = _writes(database.set_meta)
+get_meta = _reads(database.get_meta)
+
+# news subscriptions
+save_subscription = _writes(database.save_subscription)
+get_subscription = _reads(database.get_subscription)
+get_subscriptions = _reads(database.get_subscriptions)
+
+# regex patterns & ignored channels
+save_regex_pattern = _writes(database.save_regex_pattern)
+get_regex_pattern = _reads(database.get_regex_pattern)
+remove_regex_pattern = _writes(database.remove_regex_pattern)
+save_regex_ignored_channel = _writes(database.save_regex_ignored_channel)
+remove_regex_ignored_channel = _writes(database.remove_regex_ignored_channel)
+get_regex_ignored_channels = _reads(database.get_regex_ignored_channels)
+
+# regex rules
+save_regex_rule = _writes(database.save_regex_rule)
+remove_regex_rule = _writes(database.remove_regex_rule)
+get_regex_rules = _reads(database.get_regex_rules)
@@ -0,0 +1,250 @@
+"""End-to-end bot benchmark with a fake gateway and stub news sites.
+
+Imports ditto.py without connecting to Discord, inside a temporary directory so it
+gets its own bot_data.db and log file, then:
+
+- feeds on_message a synthetic message stream across many guilds with regex
+  patterns, rule sets and ignored channels, and reports messages/sec and latency;
+- runs check_and_post_articles against a local HTTP stub serving fixture pages
+  (fresh articles every cycle) with mock channels, and reports cycle duration,
+  sends, HTTP requests, database calls and the longest event loop stall per cycle.
+
+Command processing is skipped (it needs a live connection state). Run it on two
+commits with the same arguments to compare them.
+
+Usage: python benchmarks/bench_bot.py [--guilds 2000] [--messages 20000] [--cycles 5] [--news feed|html]
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+import statistics
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import fixtures
+
+TRIGGER_WORDS = ["trade", "trading", "wts", "wtb", "ft", "lf"]
+ARTICLES_PER_CYCLE = 6
+
+# serves the fixture pages; the homepage and feed list new articles for every cycle
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    base_url = ""
+    cycle = 1
+    requests = 0
+
+    def do_GET(self):
+        StubHandler.requests += 1
+        if self.path == "/ptcg":
+            page = fixtures.ptcg_homepage(ARTICLES_PER_CYCLE, seed=self.cycle, base_url=self.base_url)
+        elif self.path == "/feed":
+            page = fixtures.ptcg_feed(ARTICLES_PER_CYCLE, seed=self.cycle, base_url=self.base_url)
+        elif self.path == "/pocket":
+            page = fixtures.pocket_homepage(ARTICLES_PER_CYCLE, seed=self.cycle)
+        else:
+            page = fixtures.article_page(seed=len(self.path))
+        body = page.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # image checks: every full-size upload exists
+    def do_HEAD(self):
+        StubHandler.requests += 1
+        self.send_response(200 if self.path.startswith("/wp-content/") else 404)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+def start_stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    StubHandler.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    return server
+
+class FakeChannel:
+    sends = 0
+
+    def __init__(self, channel_id, parent=None):
+        self.id = channel_id
+        if parent is not None:
+            self.parent = parent
+
+    async def send(self, content=None, embed=None, allowed_mentions=None):
+        FakeChannel.sends += 1
+
+class FakeAuthor:
+    bot = False
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+
+class FakeMessage:
+    replies = 0
+
+    def __init__(self, guild, channel, content):
+        self.author = FakeAuthor
+        self.guild = guild
+        self.channel = channel
+        self.content = content
+
+    async def reply(self, content=None, allowed_mentions=None):
+        FakeMessage.replies += 1
+
+def guild_id(index):
+    return 10**17 + index
+
+# regex settings for a third of the guilds, rule sets for another third, nothing for the rest
+def populate(database, guilds, rules_per_guild):
+    rng = random.Random(1)
+    for index in range(guilds):
+        server_id = str(guild_id(index))
+        if index % 3 == 0:
+            database.save_regex_pattern(server_id, rf"\b({'|'.join(rng.sample(TRIGGER_WORDS, 3))})\b")
+            database.save_regex_ignored_channel(server_id, str(index * 10 + 9))
+        elif index % 3 == 1:
+            for rule in range(rules_per_guild):
+                database.save_regex_rule(server_id, f"rule{rule}", rf"\b{rng.choice(fixtures.LOREM)}{rule}\b", "hi")
+        database.save_subscription(server_id, "ptcg", str(index * 10 + 1), str(index))
+        if index % 2 == 0:
+            database.save_subscription(server_id, "pocket", str(index * 10 + 2), None)
+
+def message_stream(count, guilds):
+    rng = random.Random(2)
+    guild_objects = [FakeGuild(guild_id(index)) for index in range(guilds)]
+    messages = []
+    for _ in range(count):
+        index = rng.randrange(guilds)
+        channel = FakeChannel(index * 10 + rng.choice((3, 4, 9)))
+        words = [rng.choice(fixtures.LOREM) for _ in range(rng.randint(3, 30))]
+        if rng.random() < 0.05:
+            words.insert(rng.randrange(len(words)), rng.choice(TRIGGER_WORDS))
+        messages.append(FakeMessage(guild_objects[index], channel, " ".join(words)))
+    return messages
+
+async def bench_messages(ditto, messages, window):
+    latencies = []
+
+    async def handle(message):
+        start = time.perf_counter()
+        await ditto.on_message(message)
+        latencies.append(time.perf_counter() - start)
+
+    # like the gateway, every event is its own task; `window` events are in flight at a time
+    start = time.perf_counter()
+    for offset in range(0, len(messages), window):
+        await asyncio.gather(*(handle(message) for message in messages[offset:offset + window]))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"on_message: {len(messages)} messages, {len(messages) / elapsed:,.0f} msgs/sec, "
+          f"p50 {statistics.median(latencies) * 1e6:.0f}us, p99 {latencies[int(len(latencies) * 0.99) - 1] * 1e6:.0f}us, "
+          f"{FakeMessage.replies} replies")
+
+# longest time the event loop was blocked while this probe ran (how late a 1ms sleep woke up)
+class LoopStallProbe:
+    def __init__(self):
+        self.longest = 0.0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            self.longest = max(self.longest, time.perf_counter() - start - 0.001)
+
+    def start(self):
+        self.longest = 0.0
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+async def bench_news(ditto, cycles):
+    import metrics
+    import sources
+    import async_database
+
+    await async_database.register_consumer(ditto.NEWS_CONSUMER)
+    durations = []
+    probe = LoopStallProbe()
+    for cycle in range(1, cycles + 1):
+        StubHandler.cycle = cycle
+        for source in sources.SOURCES.values():
+            source.next_poll = 0.0
+        sends, requests, db_calls = FakeChannel.sends, StubHandler.requests, metrics.db_seconds.count()
+
+        probe.start()
+        start = time.perf_counter()
+        await ditto.check_and_post_articles.coro()
+        await ditto.delivery_queue.close()
+        durations.append(time.perf_counter() - start)
+        await probe.stop()
+
+        print(f"news cycle {cycle}: {durations[-1] * 1000:.0f}ms, {FakeChannel.sends - sends} sends, "
+              f"{StubHandler.requests - requests} HTTP requests, {metrics.db_seconds.count() - db_calls} DB calls, "
+              f"longest loop stall {probe.longest * 1000:.1f}ms")
+    print(f"news cycle mean: {statistics.mean(durations) * 1000:.0f}ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--guilds", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--rules", type=int, default=10, help="rules per guild that uses rule sets")
+    parser.add_argument("--window", type=int, default=64, help="message events in flight at a time")
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--news", choices=("feed", "html"), default="feed")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        import database
+        database.setup_database()
+        populate(database, args.guilds, args.rules)
+
+        import metrics
+        metrics.ENABLED = True  # counted for the report, not served
+        import ditto
+        import sources
+
+        server = start_stub_server()
+        base_url = StubHandler.base_url
+        sources.SOURCES["ptcg"].url = base_url + "/ptcg"
+        sources.SOURCES["ptcg"].feed_url = base_url + "/feed" if args.news == "feed" else None
+        sources.SOURCES["pocket"].url = base_url + "/pocket"
+        sources.SOURCES["pocket"].selectors = sources.SOURCES["pocket"].selectors._replace(base_url=base_url)
+
+        channels = {}
+        ditto.bot.get_channel = lambda channel_id: channels.setdefault(channel_id, FakeChannel(channel_id))
+
+        async def skip_commands(message):
+            pass
+        ditto.bot.process_commands = skip_commands
+
+        async def run():
+            await bench_messages(ditto, message_stream(args.messages, args.guilds), args.window)
+            await bench_news(ditto, args.cycles)
+
+        print(f"{args.guilds} guilds, news from {args.news}")
+        asyncio.run(run())
+        server.shutdown()
+        os.chdir(REPO_ROOT)
+
+if __name__ == "__main__":
+    main()
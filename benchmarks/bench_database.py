@@ -0,0 +1,91 @@
+"""SQLite per-call latency benchmark.
+
+Compares the old connect/query/close-per-call pattern against the pooled
+connection layer in database.py, for a read (get_subscription) and a write
+(save_subscription), then repeats the pooled reads from asyncio.to_thread workers.
+
+Usage: python benchmarks/bench_database.py [--calls 5000]
+"""
+import os
+import sys
+import time
+import sqlite3
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+def naive_get_subscription(server_id):
+    conn = sqlite3.connect(database.DB_FILE)
+    try:
+        return conn.execute("SELECT channel_id, role_id FROM subscriptions WHERE server_id = ? AND source = 'ptcg'",
+                            (server_id,)).fetchone()
+    finally:
+        conn.close()
+
+def naive_save_subscription(server_id, role_id):
+    conn = sqlite3.connect(database.DB_FILE)
+    try:
+        conn.execute("INSERT INTO subscriptions (server_id, source, channel_id, role_id) VALUES (?, 'ptcg', '1', ?) "
+                     "ON CONFLICT(server_id, source) DO UPDATE SET role_id = excluded.role_id",
+                     (server_id, role_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+def measure(label, func, calls):
+    timings = []
+    for i in range(calls):
+        start = time.perf_counter()
+        func(i)
+        timings.append(time.perf_counter() - start)
+    report(label, timings)
+
+def report(label, timings):
+    timings = sorted(timings)
+    p50 = statistics.median(timings) * 1e6
+    p99 = timings[int(len(timings) * 0.99) - 1] * 1e6
+    print(f"{label:<32} p50 {p50:>8.1f}us   p99 {p99:>8.1f}us")
+
+async def measure_threaded(label, func, calls, concurrency=8):
+    timings = []
+
+    async def worker(offset):
+        for i in range(offset, calls, concurrency):
+            start = time.perf_counter()
+            await asyncio.to_thread(func, i)
+            timings.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+    report(label, timings)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--servers", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_FILE = os.path.join(tmp, "bench.db")
+        database.setup_database()
+        for i in range(args.servers):
+            database.save_subscription(str(i), "ptcg", "1", str(i * 7))
+
+        servers = args.servers
+        get = lambda i: database.get_subscription(str(i % servers), "ptcg")
+        save = lambda i: database.save_subscription(str(i % servers), "ptcg", "1", str(i))
+        measure("naive read  (connect per call)", lambda i: naive_get_subscription(str(i % servers)), args.calls)
+        measure("naive write (connect per call)", lambda i: naive_save_subscription(str(i % servers), str(i)), args.calls)
+        measure("pooled read", get, args.calls)
+        measure("pooled write", save, args.calls)
+        asyncio.run(measure_threaded("pooled read (to_thread x8)", get, args.calls))
+        asyncio.run(measure_threaded("pooled write (to_thread x8)", save, args.calls))
+
+        database.close_connections()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Scraper session benchmark against a local stub server.
+
+Compares creating a fresh cloudscraper instance per request (the old _sync_get)
+with the shared per-host session pool in http_client, and reports per-fetch
+latency and how many TCP connections the stub server had to accept.
+
+Usage: python benchmarks/bench_http.py [--requests 300] [--concurrency 4]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import threading
+import statistics
+import cloudscraper
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import http_client
+
+PAGE = ("<html><body>" + "<article><h2>Title</h2><a href='/a'>x</a><p>" + "lorem ipsum " * 50 + "</p></article>" * 20 + "</body></html>").encode()
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        StubHandler.connections += 1
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+def start_stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def fresh_scraper_get(url):
+    sc = cloudscraper.create_scraper()
+    r = sc.get(url, headers=http_client.HEADERS, timeout=15)
+    return r.status_code, r.text
+
+async def run(label, fetch, url, requests, concurrency):
+    StubHandler.connections = 0
+    timings = []
+
+    async def worker(count):
+        for _ in range(count):
+            start = time.perf_counter()
+            status, body = await fetch(url)
+            assert status == 200
+            timings.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    timings.sort()
+    print(f"{label:<20} {len(timings) / elapsed:>8.1f} req/s   p50 {statistics.median(timings) * 1000:>7.2f}ms   "
+          f"p99 {timings[int(len(timings) * 0.99) - 1] * 1000:>7.2f}ms   connections {StubHandler.connections}")
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    server = start_stub_server()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    await run("fresh scraper", lambda u: asyncio.to_thread(fresh_scraper_get, u), url, args.requests, args.concurrency)
+    await run("session pool", http_client.fetch, url, args.requests, args.concurrency)
+
+    http_client.session_pool.close()
+    server.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+"""Gateway cache memory benchmark.
+
+Builds a discord.py client with each gateway profile from gateway.py, feeds its
+connection state synthetic GUILD_CREATE payloads (channels, roles, emojis, members,
+voice states) and MESSAGE_CREATE events, and reports the resident memory the cached
+state costs per 1,000 guilds. Each profile runs in a fresh process so the numbers
+don't share an allocator.
+
+Usage: python benchmarks/bench_memory.py [--guilds 2000] [--members 50] [--messages 5000]
+"""
+import gc
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BOT_ID = 1318567932661338183
+
+def rss_bytes():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def user(user_id):
+    return {"id": str(user_id), "username": f"user{user_id}", "discriminator": "0", "avatar": None, "global_name": None}
+
+def guild_payload(index, channels, members):
+    guild_id = 10**17 + index * 1000
+    member_ids = [BOT_ID] + [guild_id + 500 + m for m in range(members)]
+    return {
+        "id": str(guild_id),
+        "name": f"guild {index}",
+        "owner_id": str(member_ids[-1]),
+        "member_count": members + 1,
+        "features": [],
+        "roles": [{"id": str(guild_id + r), "name": f"role {r}", "permissions": "0", "position": r, "color": 0,
+                   "hoist": False, "managed": False, "mentionable": False} for r in range(10)],
+        "channels": [{"id": str(guild_id + 100 + c), "type": 0, "name": f"channel-{c}", "position": c,
+                      "permission_overwrites": [], "topic": "lorem ipsum " * 10} for c in range(channels)],
+        "emojis": [{"id": str(guild_id + 300 + e), "name": f"emoji{e}", "roles": [], "require_colons": True,
+                    "managed": False, "animated": False, "available": True} for e in range(25)],
+        "stickers": [],
+        "members": [{"user": user(member_id), "roles": [], "joined_at": "2024-01-01T00:00:00+00:00",
+                     "deaf": False, "mute": False, "flags": 0} for member_id in member_ids],
+        "voice_states": [{"user_id": str(member_id), "channel_id": str(guild_id + 100), "session_id": "x",
+                          "deaf": False, "mute": False, "self_deaf": False, "self_mute": False,
+                          "self_video": False, "suppress": False} for member_id in member_ids[1:6]],
+        "presences": [],
+        "threads": [],
+        "stage_instances": [],
+        "guild_scheduled_events": [],
+    }
+
+def message_payload(guild, number, channels):
+    guild_id = int(guild["id"])
+    author = guild["members"][1 + number % (len(guild["members"]) - 1)]
+    return {
+        "id": str(guild_id + 10**6 + number), "channel_id": str(guild_id + 100 + number % channels),
+        "guild_id": guild["id"], "author": author["user"], "member": {"roles": [], "joined_at": author["joined_at"],
+                                                                      "deaf": False, "mute": False},
+        "content": "lorem ipsum dolor sit amet " * 4, "timestamp": "2024-01-01T00:00:00+00:00",
+        "edited_timestamp": None, "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [],
+        "attachments": [], "embeds": [], "pinned": False, "type": 0,
+    }
+
+# runs one profile in this process and prints its measurements as JSON
+def measure(profile, guilds, channels, members, messages):
+    import discord
+    import gateway
+
+    client = discord.Client(**gateway.client_options(profile))
+    state = client._connection
+    state.dispatch = lambda *args, **kwargs: None  # no event loop here, nobody listens
+    state.user = discord.ClientUser(state=state, data=user(BOT_ID))
+
+    gc.collect()
+    before = rss_bytes()
+    payloads = [guild_payload(index, channels, members) for index in range(guilds)]
+    for payload in payloads:
+        state._add_guild_from_data(payload)
+    for number in range(messages):
+        state.parse_message_create(message_payload(payloads[number % guilds], number, channels))
+    del payloads
+    gc.collect()
+    after = rss_bytes()
+
+    print(json.dumps({
+        "profile": profile,
+        "rss_per_1k_guilds": (after - before) * 1000 / guilds,
+        "cached_members": sum(len(guild.members) for guild in client.guilds),
+        "cached_messages": len(state._messages or ()),
+        "cached_emojis": len(client.emojis),
+    }))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--guilds", type=int, default=2000)
+    parser.add_argument("--channels", type=int, default=20)
+    parser.add_argument("--members", type=int, default=50, help="members in each GUILD_CREATE payload")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--profile", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        measure(args.profile, args.guilds, args.channels, args.members, args.messages)
+        return
+
+    import gateway
+    print(f"{args.guilds} guilds, {args.channels} channels & {args.members} members each, {args.messages} messages")
+    for profile in gateway.PROFILES:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--profile", profile, "--guilds", str(args.guilds),
+             "--channels", str(args.channels), "--members", str(args.members), "--messages", str(args.messages)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"  {profile:<6} {result['rss_per_1k_guilds'] / 2**20:>8.1f} MB RSS per 1k guilds   "
+              f"members {result['cached_members']:>7}   messages {result['cached_messages']:>5}   "
+              f"emojis {result['cached_emojis']:>6}")
+
+if __name__ == "__main__":
+    main()
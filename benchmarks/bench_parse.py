@@ -0,0 +1,82 @@
+"""HTML extraction benchmark.
+
+Runs every extraction engine in extractors.py over the fixture pages (see
+benchmarks/fixtures.py) and reports CPU time and peak traced memory per page,
+and whether each engine agrees with the full html.parser tree. Also compares one
+news cycle read from an RSS feed against scraping the homepage plus every article.
+
+Usage: python benchmarks/bench_parse.py [--rounds 20]
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import feeds
+import extractors
+from fixtures import load_fixture_pages, ptcg_homepage, ptcg_feed, article_page
+
+def listing_selectors(name):
+    if name.startswith("pocket"):
+        return extractors.POCKET_LISTING
+    if name.endswith("homepage"):
+        return extractors.PTCG_LISTING
+    return None
+
+def measure(func, rounds):
+    start = time.process_time()
+    for _ in range(rounds):
+        result = func()
+    cpu = (time.process_time() - start) / rounds
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, cpu, peak
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    engines = [e for e in extractors.ENGINES if e != "auto" and (e != "lxml" or extractors.HAS_LXML)]
+    for name, page in load_fixture_pages().items():
+        selectors = listing_selectors(name)
+        print(f"{name} ({len(page) / 1024:.0f} KB)")
+        baseline = None
+        for engine in engines:
+            if selectors:
+                if engine == "incremental":
+                    continue
+                func = lambda: extractors.extract_articles(page, selectors, engine)
+            else:
+                func = lambda: extractors.extract_first_paragraph(page, engine)
+            result, cpu, peak = measure(func, args.rounds)
+            if baseline is None:
+                baseline = result
+            same = "same" if result == baseline else "DIFFERENT"
+            print(f"  {engine:<12} cpu {cpu * 1000:>8.2f}ms   peak {peak / 1024:>8.0f} KB   {same}")
+
+    # one cycle: scraping downloads the homepage and every article page, the feed is one download
+    count = 10
+    homepage = ptcg_homepage(count)
+    articles = [article_page(seed=i) for i in range(count)]
+    feed = ptcg_feed(count)
+
+    def scrape():
+        listed = extractors.extract_articles(homepage, extractors.PTCG_LISTING)
+        return [extractors.extract_first_paragraph(page) for page in articles[:len(listed)]]
+
+    _, scrape_cpu, _ = measure(scrape, args.rounds)
+    _, feed_cpu, _ = measure(lambda: feeds.parse_feed(feed), args.rounds)
+    scrape_kb = (len(homepage) + sum(len(page) for page in articles)) / 1024
+    print(f"cycle of {count} articles")
+    print(f"  {'scrape':<12} cpu {scrape_cpu * 1000:>8.2f}ms   downloaded {scrape_kb:>6.0f} KB in {count + 1} requests")
+    print(f"  {'feed':<12} cpu {feed_cpu * 1000:>8.2f}ms   downloaded {len(feed) / 1024:>6.0f} KB in 1 request")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Regex matching microbenchmark.
+
+Compares matching with raw pattern strings (re.search, relying on re's internal
+cache) against the per-guild compiled pattern registry, then compares scanning a
+message once per rule against the prefiltered rule matcher as the rule count grows.
+
+Usage: python benchmarks/bench_regex.py [--guilds 10000] [--messages 200000]
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import regex_engine
+
+WORDS = ["trade", "selling", "buying", "pikachu", "charizard", "deck", "pack", "mewtwo", "pull", "rare",
+         "hello", "anyone", "want", "my", "for", "looking", "offer", "pocket", "live", "event"]
+
+def make_patterns(count, rng):
+    patterns = {}
+    for i in range(count):
+        words = rng.sample(WORDS, 2)
+        # unique per guild so every pattern is a distinct compiled object
+        patterns[str(i)] = rf"\b{words[0]}\b.*\b{words[1]}\b|\bguild{i}\b"
+    return patterns
+
+def make_messages(count, rng):
+    return [" ".join(rng.choices(WORDS, k=rng.randint(3, 20))) for _ in range(count)]
+
+def run(label, guild_ids, messages, match):
+    start = time.perf_counter()
+    matched = 0
+    for server_id, content in zip(guild_ids, messages):
+        if match(server_id, content):
+            matched += 1
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {len(messages) / elapsed:>12,.0f} matches/sec ({matched} hits, {elapsed:.2f}s)")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--guilds", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    patterns = make_patterns(args.guilds, rng)
+    guild_ids = [str(rng.randrange(args.guilds)) for _ in range(args.messages)]
+    messages = make_messages(args.messages, rng)
+
+    print(f"{args.guilds} active guild patterns, {args.messages} messages")
+
+    run("re.search(str)", guild_ids, messages,
+        lambda server_id, content: re.search(patterns[server_id], content, re.IGNORECASE))
+
+    registry = regex_engine.PatternRegistry(max_size=args.guilds)
+    for server_id, pattern in patterns.items():
+        registry.register(server_id, pattern)
+    run("PatternRegistry", guild_ids, messages,
+        lambda server_id, content: registry.get_compiled(server_id, patterns[server_id]).search(content))
+
+    print()
+    rule_messages = messages[:20000]
+    ids = guild_ids[:len(rule_messages)]
+    for rule_count in (1, 10, 50, 200):
+        rules = {f"rule{i}": (rf"\b(?:wts|wtb|lf)\s+{w}{i}\b|\b{w}{i} for trade\b", f"reply {i}")
+                 for i, w in enumerate(rng.choices(WORDS, k=rule_count))}
+        compiled_rules = [regex_engine.compile_pattern(pattern) for pattern, reply in rules.values()]
+        matcher = regex_engine.RuleMatcher(rules)
+        run(f"{rule_count} rules, per-rule", ids, rule_messages,
+            lambda server_id, content: any(c.search(content) for c in compiled_rules))
+        run(f"{rule_count} rules, prefiltered", ids, rule_messages,
+            lambda server_id, content: matcher.match(content))
+
+if __name__ == "__main__":
+    main()
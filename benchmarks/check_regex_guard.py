@@ -0,0 +1,62 @@
+"""Regression check for the static regex complexity check.
+
+Runs regex_engine.check_complexity over patterns known to backtrack catastrophically
+(each must be rejected) and over everyday moderation patterns (each must be accepted),
+prints the verdicts and exits non-zero if any pattern lands on the wrong side.
+
+Usage: python benchmarks/check_regex_guard.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import regex_engine
+
+# each of these runs for seconds to minutes on a short message of the repeated character
+CATASTROPHIC = [
+    r"(a+)+b",
+    r"(a|a)*b",
+    r"(a|aa)+c",
+    r"(x?x?){20}y",
+    r"(?:a?){25}a{25}",
+    r"(a{1,10}){1,10}x",
+    r"(a{1,20}){1,20}b",
+    r"(\w{1,99}\s?){1,99}$",
+    r"(a+){3}b",
+    r"(x+x+)+y",
+    r"(a+)(a+)(a+)(a+)(a+)b",
+    r".*a.*b.*c",
+]
+
+ACCEPTED = [
+    r"\b(trade|wts|wtb)\b",
+    r"\b(buy|sell)(ing|s)?\b",
+    r"\b(w[t7]s|sell(ing)?)\b.*\$\d+",
+    r"(\d{1,3}\.){3}\d{1,3}",
+    r"free.*nitro.*gift",
+    r"(https?://)?(www\.)?discord\.gg/\w+",
+    r"https?://\S+",
+    r"[^\s]+@[^\s]+\.com",
+    r"\w+\s+\w+\s+\w+",
+    r"(\w+\s){3}",
+    r"(\w\s?)+x",
+    r"((a+)b)+",
+    r"(ab|cd)+",
+    r"colou?r",
+    r"^!\w+$",
+]
+
+def main():
+    wrong = 0
+    for expect_rejected, patterns in ((True, CATASTROPHIC), (False, ACCEPTED)):
+        for pattern in patterns:
+            reason = regex_engine.check_complexity(pattern)
+            ok = (reason is not None) == expect_rejected
+            wrong += not ok
+            print(f"{'ok ' if ok else 'BAD'} {'rejected' if reason else 'accepted':<9} {pattern}")
+    print(f"{wrong} wrong verdicts")
+    sys.exit(1 if wrong else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Synthetic news-site pages shaped like the PokeBeach and Pokemon Zone markup the
+extractors target. Real pages saved as benchmarks/fixtures/*.html are used too,
+when present, by the benchmarks that take fixture pages.
+"""
+import os
+import random
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+LOREM = ("Pokemon Trading Card Game news lorem ipsum dolor sit amet consectetur adipiscing elit "
+         "sed do eiusmod tempor incididunt ut labore et dolore magna aliqua").split()
+
+def _words(rng, count):
+    return " ".join(rng.choice(LOREM) for _ in range(count))
+
+def _chrome(rng, body):
+    # navigation, scripts and sidebars that the extractors have to skip over
+    nav = "".join(f"<li><a href='/c/{i}'>{_words(rng, 2)}</a></li>" for i in range(60))
+    sidebar = "".join(f"<div class='widget'><h3>{_words(rng, 3)}</h3><ul>"
+                      + "".join(f"<li><a href='/t/{j}'>{_words(rng, 4)}</a></li>" for j in range(15))
+                      + "</ul></div>" for _ in range(8))
+    scripts = "".join(f"<script>var cfg{i} = {{a: {i}, b: '{_words(rng, 10)}'}};</script>" for i in range(30))
+    return (f"<!DOCTYPE html><html><head><title>News</title>{scripts}</head><body>"
+            f"<header><nav><ul>{nav}</ul></nav></header><main>{body}</main>"
+            f"<aside>{sidebar}</aside><footer><p>{_words(rng, 40)}</p></footer></body></html>")
+
+def ptcg_homepage(article_count=24, seed=1, base_url="https://www.pokebeach.com"):
+    rng = random.Random(seed)
+    cards = "".join(
+        f"<article class='post-{i}'><div class='thumb'><a href='{base_url}/2026/article-{seed}-{i}'>"
+        f"<img src='{base_url}/wp-content/uploads/img-{i}-300x200.jpg'></a></div>"
+        f"<h2>{_words(rng, 8)}</h2><div class='meta'>{_words(rng, 5)}</div><p>{_words(rng, 40)}</p></article>"
+        for i in range(article_count)
+    )
+    return _chrome(rng, cards)
+
+def pocket_homepage(article_count=24, seed=1):
+    rng = random.Random(seed)
+    cards = "".join(
+        f"<article class='featured-article-preview'><a class='featured-article-preview__poster' href='/articles/pocket-{seed}-{i}/'>"
+        f"<img src='https://www.pokemon-zone.com/img/{i}.webp'></a>"
+        f"<h2 class='featured-article-preview__title'>{_words(rng, 8)}</h2></article>"
+        for i in range(article_count)
+    )
+    return _chrome(rng, cards)
+
+def article_page(paragraphs=30, seed=1, in_article=True):
+    rng = random.Random(seed)
+    content = "".join(f"<p>{_words(rng, 60)}</p>" for _ in range(paragraphs))
+    if in_article:
+        body = f"<article><h1>{_words(rng, 8)}</h1>{content}</article>"
+    else:
+        body = f"<div class='media-block'><div class='media-block__primary'>{content}</div></div>"
+    return _chrome(rng, body)
+
+# WordPress-style RSS feed of the same posts as ptcg_homepage (full post body in content:encoded)
+def ptcg_feed(article_count=10, seed=1, base_url="https://www.pokebeach.com", paragraphs=30):
+    rng = random.Random(seed)
+    items = "".join(
+        f"<item><title>{_words(rng, 8)}</title><link>{base_url}/2026/article-{seed}-{i}</link>"
+        f"<pubDate>Sat, 17 Oct 2026 12:00:00 +0000</pubDate>"
+        f"<description><![CDATA[<p>{_words(rng, 40)} [&#8230;]</p>]]></description>"
+        f"<content:encoded><![CDATA[<p><img src='{base_url}/wp-content/uploads/img-{i}-300x200.jpg'></p>"
+        + "".join(f"<p>{_words(rng, 60)}</p>" for _ in range(paragraphs))
+        + "]]></content:encoded></item>"
+        for i in range(article_count)
+    )
+    return ("<?xml version='1.0' encoding='UTF-8'?>"
+            "<rss version='2.0' xmlns:content='http://purl.org/rss/1.0/modules/content/'><channel>"
+            f"<title>PokeBeach</title><link>{base_url}</link><lastBuildDate>Sat, 17 Oct 2026 12:00:00 +0000</lastBuildDate>"
+            f"{items}</channel></rss>")
+
+# {name: html} of every fixture page: synthetic ones plus any saved real pages
+def load_fixture_pages():
+    pages = {
+        "ptcg_homepage": ptcg_homepage(),
+        "pocket_homepage": pocket_homepage(),
+        "article_page": article_page(),
+        "article_page_no_article_tag": article_page(in_article=False),
+    }
+    if os.path.isdir(FIXTURE_DIR):
+        for name in sorted(os.listdir(FIXTURE_DIR)):
+            if name.endswith(".html"):
+                with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8", errors="replace") as f:
+                    pages[name[:-5]] = f.read()
+    return pages
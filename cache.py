@@ -0,0 +1,193 @@
+import time
+import asyncio
+import logging
+import itertools
+import database
+import async_database
+
+from collections import OrderedDict
+
+logger = logging.getLogger("dittologger")
+
+# bounded least-recently-used cache with hit/miss counters
+class LRUCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key, default=None):
+        # reads without touching the counters or the eviction order
+        return self._data.get(key, default)
+
+    def set(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        return self._data.pop(key, default)
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(hit_rate, 4),
+        }
+
+# LRU cache whose entries also expire after ttl seconds
+class TTLCache(LRUCache):
+    def __init__(self, max_size, ttl):
+        super().__init__(max_size)
+        self.ttl = ttl
+
+    def get(self, key, default=None):
+        entry = super().get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            # count the expired entry as a miss rather than a hit
+            self.hits -= 1
+            self.misses += 1
+            return default
+        return value
+
+    def set(self, key, value):
+        super().set(key, (time.monotonic() + self.ttl, value))
+
+# unique across the whole process, so a reloaded config never reuses a stale matcher
+_rules_versions = itertools.count(1)
+
+# regex moderation settings for a single guild
+class GuildConfig:
+    __slots__ = ("pattern", "ignored_channels", "rules", "rules_version")
+
+    def __init__(self, pattern=None, ignored_channels=None, rules=None):
+        self.pattern = pattern
+        self.ignored_channels = set(ignored_channels or ())
+        self.rules = dict(rules or {})  # {name: (pattern, reply)}
+        self.rules_version = next(_rules_versions)
+
+EMPTY_CONFIG = GuildConfig()
+
+# per-guild moderation config kept in memory so on_message never has to hit SQLite
+class GuildConfigCache(LRUCache):
+    def __init__(self, max_size=10000):
+        super().__init__(max_size)
+        # True while every configured guild in the DB is held in the cache,
+        # so a miss can be answered with an empty config without a query
+        self._complete = False
+
+    def set(self, key, value):
+        evictions = self.evictions
+        super().set(key, value)
+        if self.evictions != evictions:
+            self._complete = False
+
+    # LOADS every configured guild at startup
+    def warm(self):
+        configs = {}
+        for server_id, pattern in database.get_all_regex_patterns():
+            configs[server_id] = GuildConfig(pattern=pattern)
+        for server_id, channel_id in database.get_all_regex_ignored_channels():
+            configs.setdefault(server_id, GuildConfig()).ignored_channels.add(channel_id)
+        for server_id, name, pattern, reply in database.get_all_regex_rules():
+            configs.setdefault(server_id, GuildConfig()).rules[name] = (pattern, reply)
+
+        self.clear()
+        for server_id, config in list(configs.items())[:self.max_size]:
+            self._data[server_id] = config
+        self._complete = len(configs) <= self.max_size
+
+        logger.info(f"Guild config cache warmed with {len(self._data)} of {len(configs)} configured guilds.")
+
+    # GETS the config for a guild, falling back to the DB (off the event loop) on a miss
+    async def get_config(self, server_id):
+        config = self.get(server_id)
+        if config is not None:
+            return config
+        if self._complete:
+            return EMPTY_CONFIG
+
+        pattern, ignored_channels, rules = await asyncio.gather(
+            async_database.get_regex_pattern(server_id),
+            async_database.get_regex_ignored_channels(server_id),
+            async_database.get_regex_rules(server_id),
+        )
+        # a write-through update may have cached the guild while we were waiting
+        cached = self.peek(server_id)
+        if cached is not None:
+            return cached
+        config = GuildConfig(pattern=pattern, ignored_channels=ignored_channels, rules=rules)
+        self.set(server_id, config)
+        return config
+
+    # write-through updates, called after the matching database.save_*/remove_* call.
+    # guilds that are not cached are left alone and will be loaded on their next miss
+    def _entry_for_write(self, server_id):
+        config = self.peek(server_id)
+        if config is None and self._complete:
+            config = GuildConfig()
+            self.set(server_id, config)
+        return config
+
+    def set_pattern(self, server_id, pattern):
+        config = self._entry_for_write(server_id)
+        if config is not None:
+            config.pattern = pattern
+
+    def remove_pattern(self, server_id):
+        config = self.peek(server_id)
+        if config is not None:
+            config.pattern = None
+
+    def add_ignored_channel(self, server_id, channel_id):
+        config = self._entry_for_write(server_id)
+        if config is not None:
+            config.ignored_channels.add(channel_id)
+
+    def remove_ignored_channel(self, server_id, channel_id):
+        config = self.peek(server_id)
+        if config is not None:
+            config.ignored_channels.discard(channel_id)
+
+    def set_rule(self, server_id, name, pattern, reply):
+        config = self._entry_for_write(server_id)
+        if config is not None:
+            config.rules[name] = (pattern, reply)
+            config.rules_version = next(_rules_versions)
+
+    def remove_rule(self, server_id, name):
+        config = self.peek(server_id)
+        if config is not None and config.rules.pop(name, None) is not None:
+            config.rules_version = next(_rules_versions)
@@ -1,291 +1,588 @@
+import time
+import queue
 import sqlite3
 import logging
+import threading
+
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit
 
 DB_FILE = "bot_data.db"
 logger = logging.getLogger("dittologger")
 
+# connection manager: one long-lived writer connection (serialised by a lock) plus a small
+# pool of reader connections. WAL lets the readers run while the writer commits, and every
+# connection is opened with check_same_thread=False so it can be used from asyncio.to_thread workers
+READ_POOL_SIZE = 4
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",  # safe with WAL, skips the fsync on every commit
+    "PRAGMA cache_size=-8000",    # 8 MB page cache per connection
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+_writer_conn = None
+_writer_lock = threading.Lock()
+_readers = queue.LifoQueue()
+_reader_count = 0
+_reader_count_lock = threading.Lock()
+
+def _connect():
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+# yields the shared writer connection; commits on success and rolls back on error
+@contextmanager
+def _writer():
+    global _writer_conn
+    with _writer_lock:
+        if _writer_conn is None:
+            _writer_conn = _connect()
+        try:
+            yield _writer_conn
+            _writer_conn.commit()
+        except BaseException:
+            _writer_conn.rollback()
+            raise
+
+# yields a reader connection from the pool, opening one if the pool isn't full yet
+@contextmanager
+def _reader():
+    global _reader_count
+    try:
+        conn = _readers.get_nowait()
+    except queue.Empty:
+        with _reader_count_lock:
+            can_open = _reader_count < READ_POOL_SIZE
+            if can_open:
+                _reader_count += 1
+        if can_open:
+            try:
+                conn = _connect()
+            except BaseException:
+                with _reader_count_lock:
+                    _reader_count -= 1
+                raise
+        else:
+            conn = _readers.get()
+    try:
+        yield conn
+    finally:
+        _readers.put(conn)
+
+# CLOSES every pooled connection (they are reopened on next use)
+def close_connections():
+    global _writer_conn, _reader_count
+    with _writer_lock:
+        if _writer_conn is not None:
+            _writer_conn.close()
+            _writer_conn = None
+    with _reader_count_lock:
+        while True:
+            try:
+                _readers.get_nowait().close()
+            except queue.Empty:
+                break
+        _reader_count = 0
+
 def setup_database():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    
-    # posted articles
-    cursor.execute('''CREATE TABLE IF NOT EXISTS posted_articles (
-                        link TEXT PRIMARY KEY)''')
-
-    # PTCG channels & roles
-    cursor.execute('''CREATE TABLE IF NOT EXISTS ptcg_channels (
-                        server_id TEXT PRIMARY KEY, 
-                        channel_id TEXT)''')
-
-    cursor.execute('''CREATE TABLE IF NOT EXISTS ptcg_roles (
-                        server_id TEXT PRIMARY KEY, 
-                        role_id TEXT)''')
-    
-    # Pocket channels & roles
-    cursor.execute('''CREATE TABLE IF NOT EXISTS pocket_channels (
-                        server_id TEXT PRIMARY KEY, 
-                        channel_id TEXT)''')
-    
-    cursor.execute('''CREATE TABLE IF NOT EXISTS pocket_roles (
-                        server_id TEXT PRIMARY KEY, 
-                        role_id TEXT)''')
-    
-    # regex patterns
-    cursor.execute('''CREATE TABLE IF NOT EXISTS regex_patterns (
-                        server_id TEXT PRIMARY KEY,
-                        pattern TEXT)''')
-    
-    # regex-ignored channels
-    cursor.execute('''CREATE TABLE IF NOT EXISTS regex_ignored_channels (
-                    server_id TEXT,
-                    channel_id TEXT,
-                    PRIMARY KEY (server_id, channel_id))''')
-    
-    conn.commit()
-    conn.close()
+    with _writer() as conn:
+        cursor = conn.cursor()
+
+        # posted articles
+        cursor.execute('''CREATE TABLE IF NOT EXISTS posted_articles (
+                            link TEXT PRIMARY KEY,
+                            posted_at INTEGER)''')
+
+        # append-only log of new articles: written once by the scraper, read by every gateway
+        # process from its own cursor, so scraping happens once however many shards deliver
+        cursor.execute('''CREATE TABLE IF NOT EXISTS article_log (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            link TEXT UNIQUE,
+                            source TEXT,
+                            title TEXT,
+                            image_url TEXT,
+                            paragraph TEXT,
+                            staged_at INTEGER)''')
+        cursor.execute('''CREATE INDEX IF NOT EXISTS idx_article_log_staged_at
+                            ON article_log (staged_at)''')
+
+        # last article_log id each consumer (gateway process) has fully delivered
+        cursor.execute('''CREATE TABLE IF NOT EXISTS consumer_cursors (
+                            consumer TEXT PRIMARY KEY,
+                            last_id INTEGER)''')
+
+        # which server already received which article
+        cursor.execute('''CREATE TABLE IF NOT EXISTS deliveries (
+                            server_id TEXT,
+                            link TEXT,
+                            channel_id TEXT,
+                            delivered_at INTEGER,
+                            PRIMARY KEY (server_id, link))''')
+        cursor.execute('''CREATE INDEX IF NOT EXISTS idx_deliveries_delivered_at
+                            ON deliveries (delivered_at)''')
+
+        # named leases for leader election between processes (e.g. the single news scraper)
+        cursor.execute('''CREATE TABLE IF NOT EXISTS leases (
+                            name TEXT PRIMARY KEY,
+                            holder TEXT,
+                            expires_at REAL)''')
+
+        # adaptive poll schedule of each news source, kept across restarts
+        cursor.execute('''CREATE TABLE IF NOT EXISTS source_schedules (
+                            source TEXT PRIMARY KEY,
+                            next_poll REAL,
+                            poll_interval REAL,
+                            publish_rate REAL,
+                            failures INTEGER,
+                            last_success REAL)''')
+
+        # small bot-wide key/value state (e.g. the hash of the last synced command tree)
+        cursor.execute('''CREATE TABLE IF NOT EXISTS meta (
+                            key TEXT PRIMARY KEY,
+                            value TEXT)''')
+
+        # news subscriptions: posting channel & ping role per server and news source
+        cursor.execute('''CREATE TABLE IF NOT EXISTS subscriptions (
+                            server_id TEXT,
+                            source TEXT,
+                            channel_id TEXT,
+                            role_id TEXT,
+                            PRIMARY KEY (server_id, source))''')
+        cursor.execute('''CREATE INDEX IF NOT EXISTS idx_subscriptions_source
+                            ON subscriptions (source)''')
+
+        # regex patterns
+        cursor.execute('''CREATE TABLE IF NOT EXISTS regex_patterns (
+                            server_id TEXT PRIMARY KEY,
+                            pattern TEXT)''')
+
+        # regex-ignored channels
+        cursor.execute('''CREATE TABLE IF NOT EXISTS regex_ignored_channels (
+                        server_id TEXT,
+                        channel_id TEXT,
+                        PRIMARY KEY (server_id, channel_id))''')
+
+        # regex rule sets (many named patterns per server, each with its own reply)
+        cursor.execute('''CREATE TABLE IF NOT EXISTS regex_rules (
+                        server_id TEXT,
+                        name TEXT,
+                        pattern TEXT,
+                        reply TEXT,
+                        PRIMARY KEY (server_id, name))''')
+
+        _migrate(cursor)
 
     logger.info(f"Database successfully set up!")
 
+def _table_exists(cursor, name):
+    return cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+# schema migrations, tracked with PRAGMA user_version
+def _migrate(cursor):
+    version = cursor.execute("PRAGMA user_version").fetchone()[0]
+
+    if version < 1:
+        # per-source ptcg_*/pocket_* tables -> generic subscriptions table
+        for source in ("ptcg", "pocket"):
+            if _table_exists(cursor, f"{source}_channels"):
+                role_join = (f"LEFT JOIN {source}_roles r ON r.server_id = c.server_id"
+                             if _table_exists(cursor, f"{source}_roles") else "")
+                role_column = "r.role_id" if role_join else "NULL"
+                cursor.execute(f'''INSERT OR IGNORE INTO subscriptions (server_id, source, channel_id, role_id)
+                                   SELECT c.server_id, ?, c.channel_id, {role_column}
+                                   FROM {source}_channels c {role_join}''', (source,))
+        cursor.execute("PRAGMA user_version = 1")
+        logger.info("Migrated news channels & roles to the subscriptions table.")
+
+    if version < 2:
+        # posted_at for retention pruning, and links stored in their normalised form.
+        # rows that predate the column count as posted now so they get a full retention window
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(posted_articles)")}
+        if "posted_at" not in columns:
+            cursor.execute("ALTER TABLE posted_articles ADD COLUMN posted_at INTEGER")
+        links = [row[0] for row in cursor.execute("SELECT link FROM posted_articles WHERE posted_at IS NULL")]
+        cursor.execute("DELETE FROM posted_articles WHERE posted_at IS NULL")
+        now = int(time.time())
+        cursor.executemany("INSERT OR IGNORE INTO posted_articles (link, posted_at) VALUES (?, ?)",
+                           [(normalize_link(link), now) for link in links])
+        cursor.execute('''CREATE INDEX IF NOT EXISTS idx_posted_articles_posted_at
+                            ON posted_articles (posted_at)''')
+        cursor.execute("PRAGMA user_version = 2")
+        logger.info(f"Migrated {len(links)} posted articles to normalised links with timestamps.")
+
+    if version < 3:
+        # single-process outbox -> article log; unfinished outbox rows are handed to the
+        # unsharded consumer, which skips the servers that already received them
+        if _table_exists(cursor, "article_outbox"):
+            cursor.execute('''INSERT OR IGNORE INTO article_log (link, source, title, image_url, paragraph, staged_at)
+                              SELECT link, source, title, image_url, paragraph, staged_at
+                              FROM article_outbox ORDER BY staged_at, rowid''')
+            cursor.execute("DROP TABLE article_outbox")
+        cursor.execute("INSERT OR IGNORE INTO consumer_cursors (consumer, last_id) VALUES (?, 0)", (DEFAULT_CONSUMER,))
+        cursor.execute("PRAGMA user_version = 3")
+
 # SQLite functions
-# SAVES articles to prevent future repeating articles
-def save_posted_article(link):
-    conn = sqlite3.connect(DB_FILE)
+# name of the article log consumer of an unsharded bot
+DEFAULT_CONSUMER = "default"
+# max number of ? parameters per IN (...) query (SQLite's limit is 999 on older builds)
+LOOKUP_CHUNK_SIZE = 500
+
+# SAVES a lease for holder if it is free, expired or already theirs; returns True if holder has it.
+# the check and the claim run in one write transaction, so two processes can't both win
+def acquire_lease(name, holder, ttl):
+    now = time.time()
     try:
-        cursor = conn.cursor()
-        cursor.execute("INSERT OR IGNORE INTO posted_articles (link) VALUES (?)", (link,))
-        conn.commit()
+        with _writer() as conn:
+            conn.execute(
+                "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+                "WHERE leases.holder = excluded.holder OR leases.expires_at < ?",
+                (name, holder, now + ttl, now),
+            )
+            row = conn.execute("SELECT holder FROM leases WHERE name = ?", (name,)).fetchone()
+            return row is not None and row[0] == holder
     except sqlite3.Error as e:
-        logger.error(f"Database error while trying to save article: {e}")
-    finally:
-        conn.close()
+        logger.error(f"Database error while trying to acquire lease {name}: {e}")
+        return False
 
-# LOADS previously posted articles to avoid repeats
-def load_posted_articles():
-    conn = sqlite3.connect(DB_FILE)
+# REMOVES a lease if holder has it, so another process can take over right away
+def release_lease(name, holder):
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT link FROM posted_articles")
-        links = {row[0] for row in cursor.fetchall()}
-        return links
+        with _writer() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
     except sqlite3.Error as e:
-        logger.error(f"Database error while trying to load articles: {e}")
-        return set()
-    finally:
-        conn.close()
+        logger.error(f"Database error while trying to release lease {name}: {e}")
 
-# SAVES the posting channel for PTCG articles
-def save_ptcg_channel(server_id, channel_id):
-    conn = sqlite3.connect(DB_FILE)
+# SAVES news source schedules, rows of (source, next_poll, poll_interval, publish_rate, failures, last_success)
+def save_source_schedules(rows):
     try:
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO ptcg_channels (server_id, channel_id) VALUES (?, ?) ON CONFLICT(server_id) DO UPDATE SET channel_id = excluded.channel_id", 
-                    (server_id, channel_id))
-        conn.commit()
+        with _writer() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO source_schedules "
+                "(source, next_poll, poll_interval, publish_rate, failures, last_success) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
     except sqlite3.Error as e:
-        logger.error(f"Database error while trying to save ptcg channel: {e}")
-    finally:
-        conn.close()
+        logger.error(f"Database error while trying to save source schedules: {e}")
 
-# GETS the posting channel for PTCG articles
-def get_ptcg_channel(server_id):
-    conn = sqlite3.connect(DB_FILE)
+# GETS the saved news source schedules, {source: (next_poll, poll_interval, publish_rate, failures, last_success)}
+def get_source_schedules():
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT channel_id FROM ptcg_channels WHERE server_id = ?", (server_id,))
-        row = cursor.fetchone()
-        return row[0] if row else None
+        with _reader() as conn:
+            rows = conn.execute(
+                "SELECT source, next_poll, poll_interval, publish_rate, failures, last_success FROM source_schedules"
+            ).fetchall()
+            return {row[0]: row[1:] for row in rows}
     except sqlite3.Error as e:
-        logger.error(f"Database error while trying to get ptcg channel: {e}")
+        logger.error(f"Database error while trying to get source schedules: {e}")
+        return {}
+
+# SAVES a bot-wide meta value
+def set_meta(key, value):
+    try:
+        with _writer() as conn:
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value),
+            )
+    except sqlite3.Error as e:
+        logger.error(f"Database error while trying to save meta value {key}: {e}")
+
+# GETS a bot-wide meta value, None if it was never set
+def get_meta(key):
+    try:
+        with _reader() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+            return row[0] if row else None
+    except sqlite3.Error as e:
+        logger.error(f"Database error while trying to get meta value {key}: {e}")
         return None
-    finally:
-        conn.close()
 
-def get_all_ptcg_channels():
-    conn = sqlite3.connect(DB_FILE)
+# NORMALISES an article link so URL variants of the same article dedup to one row:
+# https scheme, lowercase host, no query string or fragment, no trailing slash
+def normalize_link(link):
+    parts = urlsplit(link.strip())
+    if not parts.netloc:
+        return link.strip()
+    return urlunsplit(("https", parts.netloc.lower(), parts.path.rstrip("/") or "/", "", ""))
+
+# SAVES a cycle's new articles in one transaction: marks them posted (so no later fetch picks
+# them up again) and appends them to the article log for the gateways to deliver.
+# articles are (title, link, image_url, paragraph)
+def stage_articles(source, articles):
+    now = time.time()
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT server_id, channel_id FROM ptcg_channels")
-        return cursor.fetchall()
+        with _writer() as conn:
+            conn.executemany("INSERT OR IGNORE INTO posted_articles (link, posted_at) VALUES (?, ?)",
+                             [(normalize_link(article[1]), int(now)) for article in articles])
+            conn.executemany(
+                "INSERT OR IGNORE INTO article_log (link, source, title, image_url, paragraph, staged_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(article[1], source, article[0], article[2], article[3], now) for article in articles],
+            )
+        return True
     except sqlite3.Error as e:
-        logger.error(f"Database error while trying to get all ptcg channels: {e}")
+        logger.error(f"Database error while trying to stage articles: {e}")
+        return False
+
+# SAVES a batch of (server_id, link, channel_id, delivered_at) delivery records
+def save_deliveries(deliveries):
+    try:
+        with _writer() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO deliveries (server_id, link, channel_id, delivered_at) VALUES (?, ?, ?, ?)",
+                deliveries,
+            )
+    except sqlite3.Error as e:
+        logger.error(f"Database error while trying to save {len(deliveries)} deliveries: {e}")
+
+# SAVES a consumer's cursor the first time it is seen, starting at the end of the log
+def register_consumer(consumer):
+    try:
+        with _writer() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO consumer_cursors (consumer, last_id) "
+                "SELECT ?, COALESCE(MAX(id), 0) FROM article_log",
+                (consumer,),
+            )
+    except sqlite3.Error as e:
+        logger.error(f"Database error while trying to register consumer {consumer}: {e}")
+
+# GETS the article log entries past a consumer's cursor, oldest first, as
+# [(id, source, staged_at, (title, link, image_url, paragraph)), ...]
+def get_log_entries(consumer, limit=500):
+    try:
+        with _reader() as conn:
+            rows = conn.execute(
+                "SELECT id, source, staged_at, title, link, image_url, paragraph FROM article_log "
+                "WHERE id > (SELECT last_id FROM consumer_cursors WHERE consumer = ?) ORDER BY id LIMIT ?",
+                (consumer, limit),
+            )
+            return [(entry_id, source, staged_at, (title, link, image_url, paragraph))
+                    for entry_id, source, staged_at, title, link, image_url, paragraph in rows]
+    except sqlite3.Error as e:
+        logger.error(f"Database error while trying to read the article log: {e}")
         return []
-    finally:
-        conn.close()
 
-# SAVES the ping role for PTCG articles
-def save_ptcg_role(server_id, role_id):
-    conn = sqlite3.connect(DB_FILE)
+# SAVES a consumer's progress through the article log, together with its last delivery records
+def advance_consumer(consumer, last_id, deliveries=()):
     try:
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO ptcg_roles (server_id, role_id) VALUES (?, ?) ON CONFLICT(server_id) DO UPDATE SET role_id = excluded.role_id", 
-                    (server_id, role_id))
-        conn.commit()
+        with _writer() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO deliveries (server_id, link, channel_id, delivered_at) VALUES (?, ?, ?, ?)",
+                deliveries,
+            )
+            conn.execute("UPDATE consumer_cursors SET last_id = MAX(last_id, ?) WHERE consumer = ?", (last_id, consumer))
     except sqlite3.Error as e:
-        logger.error(f"Database error while trying to save ptcg role: {e}")
-    finally:
-        conn.close()
+        logger.error(f"Database error while trying to advance consumer {consumer}: {e}")
 
-# GETS the ping role for PTCG articles
-def get_ptcg_role(server_id):
-    conn = sqlite3.connect(DB_FILE)
+# GETS the (server_id, link) pairs already delivered, out of the given links; None on a database error
+def get_deliveries(links):
+    delivered = set()
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT role_id FROM ptcg_roles WHERE server_id = ?", (server_id,))
-        row = cursor.fetchone()
-        return row[0] if row else None
+        with _reader() as conn:
+            for start in range(0, len(links), LOOKUP_CHUNK_SIZE):
+                chunk = links[start:start + LOOKUP_CHUNK_SIZE]
+                delivered.update(conn.execute(
+                    f"SELECT server_id, link FROM deliveries WHERE link IN ({', '.join('?' * len(chunk))})", chunk
+                ))
     except sqlite3.Error as e:
-        logger.error(f"Database error while trying to get ptcg role: {e}")
+        logger.error(f"Database error while trying to get deliveries: {e}")
         return None
-    finally:
-        conn.close()
+    return delivered
 
-# SAVES the posting channel for Pocket articles
-def save_pocket_channel(server_id, channel_id):
-    conn = sqlite3.connect(DB_FILE)
+# GETS the links that haven't been posted yet, out of the candidates from one fetch.
+# only the candidates are looked up (through the primary key index), never the whole table.
+# the first of several variants of the same link is kept, in the order given
+def filter_new_links(links):
+    normalized = {}
+    for link in links:
+        normalized.setdefault(normalize_link(link), link)
+    keys = list(normalized)
     try:
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO pocket_channels (server_id, channel_id) VALUES (?, ?) ON CONFLICT(server_id) DO UPDATE SET channel_id = excluded.channel_id", 
-                    (server_id, channel_id))
-        conn.commit()
+        with _reader() as conn:
+            for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+                chunk = keys[start:start + LOOKUP_CHUNK_SIZE]
+                rows = conn.execute(
+                    f"SELECT link FROM posted_articles WHERE link IN ({', '.join('?' * len(chunk))})", chunk
+                )
+                for row in rows:
+                    normalized.pop(row[0], None)
     except sqlite3.Error as e:
-        logger.error(f"Database error while trying to save pocket channel: {e}")
-    finally:
-        conn.close()
+        # None rather than [] so the caller fails the poll instead of taking nothing as new
+        logger.error(f"Database error while trying to look up posted articles: {e}")
+        return None
+    return list(normalized.values())
 
-# GETS the posting channel for Pocket articles
-def get_pocket_channel(server_id):
-    conn = sqlite3.connect(DB_FILE)
+# REMOVES posted articles (and their log entries & delivery records) older than the retention window,
+# returns how many articles were removed
+def prune_posted_articles(retention_days):
+    cutoff = int(time.time() - retention_days * 24 * 60 * 60)
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT channel_id FROM pocket_channels WHERE server_id = ?", (server_id,))
-        row = cursor.fetchone()
-        return row[0] if row else None
+        with _writer() as conn:
+            conn.execute("DELETE FROM deliveries WHERE delivered_at < ?", (cutoff,))
+            conn.execute("DELETE FROM article_log WHERE staged_at < ?", (cutoff,))
+            return conn.execute("DELETE FROM posted_articles WHERE posted_at < ?", (cutoff,)).rowcount
     except sqlite3.Error as e:
-        logger.error(f"Database error while trying to get pocket channel: {e}")
-        return None
-    finally:
-        conn.close()
+        logger.error(f"Database error while trying to prune posted articles: {e}")
+        return 0
 
-def get_all_pocket_channels():
-    conn = sqlite3.connect(DB_FILE)
+# SAVES the posting channel & ping role of a server for a news source
+def save_subscription(server_id, source, channel_id, role_id):
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT server_id, channel_id FROM pocket_channels")
-        return cursor.fetchall()
+        with _writer() as conn:
+            conn.execute(
+                "INSERT INTO subscriptions (server_id, source, channel_id, role_id) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(server_id, source) DO UPDATE SET channel_id = excluded.channel_id, role_id = excluded.role_id",
+                (server_id, source, channel_id, role_id),
+            )
     except sqlite3.Error as e:
-        logger.error(f"Database error while trying to get all pocket channels: {e}")
-        return []
-    finally:
-        conn.close()
+        logger.error(f"Database error while trying to save {source} subscription: {e}")
 
-# SAVES the ping role for Pocket articles
-def save_pocket_role(server_id, role_id):
-    conn = sqlite3.connect(DB_FILE)
+# GETS (channel_id, role_id) of a server for a news source
+def get_subscription(server_id, source):
     try:
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO pocket_roles (server_id, role_id) VALUES (?, ?) ON CONFLICT(server_id) DO UPDATE SET role_id = excluded.role_id", 
-                    (server_id, role_id))
-        conn.commit()
+        with _reader() as conn:
+            return conn.execute(
+                "SELECT channel_id, role_id FROM subscriptions WHERE server_id = ? AND source = ?",
+                (server_id, source),
+            ).fetchone()
     except sqlite3.Error as e:
-        logger.error(f"Database error while trying to save pocket role: {e}")
-    finally:
-        conn.close()
+        logger.error(f"Database error while trying to get {source} subscription: {e}")
+        return None
 
-# GETS the ping role for Pocket articles
-def get_pocket_role(server_id):
-    conn = sqlite3.connect(DB_FILE)
+# GETS every (server_id, channel_id, role_id) subscribed to a news source; None on a database error
+def get_subscriptions(source):
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT role_id FROM pocket_roles WHERE server_id = ?", (server_id,))
-        row = cursor.fetchone()
-        return row[0] if row else None
+        with _reader() as conn:
+            return conn.execute(
+                "SELECT server_id, channel_id, role_id FROM subscriptions WHERE source = ?", (source,)
+            ).fetchall()
     except sqlite3.Error as e:
-        logger.error(f"Database error while trying to get pocket role: {e}")
+        # None rather than [] so news delivery fails (and retries) instead of skipping every server
+        logger.error(f"Database error while trying to get {source} subscriptions: {e}")
         return None
-    finally:
-        conn.close()
 
 # SAVES regex pattern
 def save_regex_pattern(server_id, pattern):
-    conn = sqlite3.connect(DB_FILE)
     try:
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO regex_patterns (server_id, pattern) VALUES (?, ?) ON CONFLICT(server_id) DO UPDATE SET pattern = excluded.pattern", 
-                    (server_id, pattern))
-        conn.commit()
+        with _writer() as conn:
+            conn.execute("INSERT INTO regex_patterns (server_id, pattern) VALUES (?, ?) ON CONFLICT(server_id) DO UPDATE SET pattern = excluded.pattern",
+                        (server_id, pattern))
     except sqlite3.Error as e:
         logger.error(f"Database error while trying to save regex pattern: {e}")
-    finally:
-        conn.close()
 
 # GETS regex pattern
 def get_regex_pattern(server_id):
-    conn = sqlite3.connect(DB_FILE)
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT pattern FROM regex_patterns WHERE server_id = ?", (server_id,))
-        row = cursor.fetchone()
-        return row[0] if row else None
+        with _reader() as conn:
+            row = conn.execute("SELECT pattern FROM regex_patterns WHERE server_id = ?", (server_id,)).fetchone()
+            return row[0] if row else None
     except sqlite3.Error as e:
         logger.error(f"Database error while trying to get regex pattern: {e}")
         return None
-    finally:
-        conn.close()
 
 # REMOVES regex pattern
 def remove_regex_pattern(server_id):
-    conn = sqlite3.connect(DB_FILE)
     try:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM regex_patterns WHERE server_id = ?", (server_id,))
-        conn.commit()
+        with _writer() as conn:
+            conn.execute("DELETE FROM regex_patterns WHERE server_id = ?", (server_id,))
     except sqlite3.Error as e:
         logger.error(f"Database error while trying to remove regex pattern: {e}")
-    finally:
-        conn.close()
 
 # SAVES regex ignored channel
 def save_regex_ignored_channel(server_id, channel_id):
-    conn = sqlite3.connect(DB_FILE)
     try:
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT OR IGNORE INTO regex_ignored_channels (server_id, channel_id) VALUES (?, ?)",
-            (server_id, channel_id),
-        )
-        conn.commit()
+        with _writer() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO regex_ignored_channels (server_id, channel_id) VALUES (?, ?)",
+                (server_id, channel_id),
+            )
     except sqlite3.Error as e:
         logger.error(f"Database error while trying to save regex ignored channel: {e}")
-    finally:
-        conn.close()
 
 # REMOVES regex ignored channel
 def remove_regex_ignored_channel(server_id, channel_id):
-    conn = sqlite3.connect(DB_FILE)
     try:
-        cursor = conn.cursor()
-        cursor.execute(
-            "DELETE FROM regex_ignored_channels WHERE server_id = ? AND channel_id = ?",
-            (server_id, channel_id),
-        )
-        conn.commit()
+        with _writer() as conn:
+            conn.execute(
+                "DELETE FROM regex_ignored_channels WHERE server_id = ? AND channel_id = ?",
+                (server_id, channel_id),
+            )
     except sqlite3.Error as e:
         logger.error(f"Database error while trying to remove regex ignored channel: {e}")
-    finally:
-        conn.close()
 
 # GETS regex ignored channel
 def get_regex_ignored_channels(server_id):
-    conn = sqlite3.connect(DB_FILE)
     try:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT channel_id FROM regex_ignored_channels WHERE server_id = ?", (server_id,)
-        )
-        ignored = {row[0] for row in cursor.fetchall()}
-        return ignored
+        with _reader() as conn:
+            rows = conn.execute(
+                "SELECT channel_id FROM regex_ignored_channels WHERE server_id = ?", (server_id,)
+            )
+            return {row[0] for row in rows}
     except sqlite3.Error as e:
         logger.error(f"Database error while trying to get regex ignored channels: {e}")
         return set()
-    finally:
-        conn.close()
+
+# GETS every regex pattern (used to warm the guild config cache)
+def get_all_regex_patterns():
+    try:
+        with _reader() as conn:
+            return conn.execute("SELECT server_id, pattern FROM regex_patterns").fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"Database error while trying to get all regex patterns: {e}")
+        return []
+
+# GETS every regex ignored channel (used to warm the guild config cache)
+def get_all_regex_ignored_channels():
+    try:
+        with _reader() as conn:
+            return conn.execute("SELECT server_id, channel_id FROM regex_ignored_channels").fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"Database error while trying to get all regex ignored channels: {e}")
+        return []
+
+# SAVES a named regex rule
+def save_regex_rule(server_id, name, pattern, reply):
+    try:
+        with _writer() as conn:
+            conn.execute(
+                "INSERT INTO regex_rules (server_id, name, pattern, reply) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(server_id, name) DO UPDATE SET pattern = excluded.pattern, reply = excluded.reply",
+                (server_id, name, pattern, reply),
+            )
+    except sqlite3.Error as e:
+        logger.error(f"Database error while trying to save regex rule: {e}")
+
+# REMOVES a named regex rule, returns True if a rule was deleted
+def remove_regex_rule(server_id, name):
+    try:
+        with _writer() as conn:
+            cursor = conn.execute("DELETE FROM regex_rules WHERE server_id = ? AND name = ?", (server_id, name))
+            return cursor.rowcount > 0
+    except sqlite3.Error as e:
+        logger.error(f"Database error while trying to remove regex rule: {e}")
+        return False
+
+# GETS the regex rules of a server as {name: (pattern, reply)}
+def get_regex_rules(server_id):
+    try:
+        with _reader() as conn:
+            rows = conn.execute("SELECT name, pattern, reply FROM regex_rules WHERE server_id = ?", (server_id,))
+            return {name: (pattern, reply) for name, pattern, reply in rows}
+    except sqlite3.Error as e:
+        logger.error(f"Database error while trying to get regex rules: {e}")
+        return {}
+
+# GETS every regex rule (used to warm the guild config cache)
+def get_all_regex_rules():
+    try:
+        with _reader() as conn:
+            return conn.execute("SELECT server_id, name, pattern, reply FROM regex_rules").fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"Database error while trying to get all regex rules: {e}")
+        return []
@@ -0,0 +1,46 @@
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger("dittologger")
+
+# nearest-rank percentile, pct in [0, 100]
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))  # ceil
+    return ordered[int(rank) - 1]
+
+# fetch-to-post latency of every article delivered in one news cycle
+class DeliveryStats:
+    def __init__(self):
+        self.latencies = []
+        self.failures = 0
+
+    def record(self, fetched_at):
+        self.latencies.append(time.monotonic() - fetched_at)
+
+    def log_summary(self, label):
+        if not self.latencies and not self.failures:
+            return
+        logger.info(
+            f"{label} delivery: {len(self.latencies)} posts, {self.failures} failures, "
+            f"p50 {percentile(self.latencies, 50):.2f}s, p99 {percentile(self.latencies, 99):.2f}s"
+        )
+
+# runs one job per channel with at most `concurrency` in flight.
+# each job posts to a single channel sequentially, so messages to the same channel share
+# one per-route rate-limit bucket in order, while different channels proceed in parallel;
+# discord.py's HTTP client still waits out per-bucket and global limits for us
+async def fan_out(jobs, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(job):
+        async with semaphore:
+            try:
+                await job()
+            except Exception as e:
+                logger.error(f"Fan-out job failed: {e}")
+
+    await asyncio.gather(*(run(job) for job in jobs))
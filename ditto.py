@@ -1,207 +1,144 @@
+import time
+# process start, for the import time & time-to-ready reported in the log
+STARTED_AT = time.perf_counter()
+
 import discord
-import io
 import os
 import re
-import aiohttp
+import json
+import hashlib
+import signal
 import asyncio
 import logging
-import cloudscraper
+import functools
+import log_setup
+import gateway
+import metrics
 import database
-import xml.etree.ElementTree as ET
+import async_database
+import cache
+import regex_engine
+import delivery
+import write_behind
+import sources
+import scraper
+import news
 
-from logging.handlers import RotatingFileHandler
 from discord.ext import tasks, commands
 from discord.ext.commands import cooldown, BucketType
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 
+IMPORT_SECONDS = time.perf_counter() - STARTED_AT
+
 load_dotenv()
 TOKEN = os.getenv("DISCORD_BOT_TOKEN")
-PTCG_URL = "https://www.pokebeach.com/"
-POCKET_URL = "https://www.pokemon-zone.com/"
+# how often the news loop checks which sources are due for a poll and delivers new articles
+NEWS_TICK_SECONDS = scraper.POLL_TICK_SECONDS
 
 log_file = "bot_activity.log"
 logger = logging.getLogger("dittologger")
-logger.setLevel(logging.INFO)
-handler = RotatingFileHandler(log_file, maxBytes=100 * 1024 * 1024, backupCount=100)
-handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-logger.addHandler(handler)
-
-database.setup_database()
-
-# discord setup
-intents = discord.Intents.default()
-intents.messages = True
-intents.message_content = True
-bot = commands.Bot(command_prefix="!", intents=intents)
-
-# fetch PTCG articles
-async def fetch_ptcg_articles(ptcg_url):
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-        'Referer': 'https://www.google.com/'
-    }
-
-    def _sync_get(url):
-        sc = cloudscraper.create_scraper()
-        r = sc.get(url, headers=headers, timeout=15)
-        return r.status_code, r.text
-
-    try:
-        status, body = await asyncio.to_thread(_sync_get, ptcg_url)
-        if status != 200:
-            logger.error(f"Error fetching the webpage: {ptcg_url}. Status code: {status}")
-            return []
-    except Exception as e:
-        logger.error(f"Request error while fetching {ptcg_url}: {e}")
-        return []
-
-    soup = BeautifulSoup(body, 'html.parser')
-
-    articles = soup.find_all('article')
-    fetched_articles = []
-    for article in articles:
-        title_tag = article.find('h2')
-        link_tag = article.find('a')
-        image_tag = article.find('img')
-
-        if title_tag and link_tag:
-            title = title_tag.text.strip()
-            link = link_tag.get('href')
-            if not link:
-                continue
-            
-            image_url = ""
-            if image_tag:
-                image_url = image_tag.get('src') or ""
-            
-            fetched_articles.append((title, link, image_url))
-
-    logger.info(f"Fetched {len(fetched_articles)} articles from {ptcg_url}.")
-    return fetched_articles
-
-async def fetch_first_paragraph(url):
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-        'Referer': 'https://www.google.com/'
-    }
-
-    def _sync_get(url):
-        sc = cloudscraper.create_scraper()
-        r = sc.get(url, headers=headers, timeout=15)
-        return r.status_code, r.text
-
-    try:
-        status, body = await asyncio.to_thread(_sync_get, url)
-        if status != 200:
-            logger.error(f"Error fetching the webpage: {url}. Status code: {status}")
-            return ""
-    except Exception as e:
-        logger.error(f"Request error while fetching {url}: {e}")
-        return ""
-    
-    soup = BeautifulSoup(body, 'html.parser')
-    
-    # 1 // look for <p> inside <article>
-    article_body = soup.find('article')
-    if article_body:
-        p = article_body.find('p')
-        if p and p.text.strip():
-            return p.text.strip()
-
-    # 2 // look for <p> inside common content divs
-    for class_name in ['media-block__primary', 'entry-content', 'post-content', 'content']:
-        content_div = soup.find('div', class_=class_name)
-        if content_div:
-            p = content_div.find('p')
-            if p and p.text.strip():
-                return p.text.strip()
-
-    # 3 // find the first substantial paragraph in the body
-    for p in soup.find_all('p'):
-        text = p.text.strip()
-        if len(text) > 50: 
-            return text
-    
-    logger.warning(f"No suitable <p> tag found in the article {url}.")
-    return "No content available."
-
-# fetch POCKET articles
-async def fetch_pocket_articles(pocket_url):
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-        'Referer': 'https://www.google.com/'
-    }
-
-    def _sync_get(url):
-        sc = cloudscraper.create_scraper()
-        r = sc.get(url, headers=headers, timeout=15)
-        return r.status_code, r.text
-
-    try:
-        status, body = await asyncio.to_thread(_sync_get, pocket_url)
-        logger.info(f"fetch_pocket_articles: GET {pocket_url} -> {status} (len={len(body) if body else 0})")
-        # 403 check bcs this website is playing games
-        if status == 403:
-            logger.error(f"403 received; response snippet: {body[:1000]!r}")
-            return []
-        if status != 200:
-            logger.error(f"Error fetching the webpage: {pocket_url}. Status code: {status}")
-            return []
-    except Exception as e:
-        logger.error(f"Request error while fetching {pocket_url}: {e}")
-        return []
 
-    soup = BeautifulSoup(body, 'html.parser')
+# guild moderation config cache (regex pattern + ignored channels)
+GUILD_CACHE_SIZE = int(os.getenv("GUILD_CACHE_SIZE", "10000"))
+guild_cache = cache.GuildConfigCache(max_size=GUILD_CACHE_SIZE)
+
+# the feed parse workers (forkserver) import this module again as __mp_main__. they only run
+# parser functions from extractors and feeds, so they skip the log writer, schema and cache setup
+if __name__ != "__mp_main__":
+    log_setup.setup_logging(logger, log_file)
+    logger.info(f"Modules imported in {IMPORT_SECONDS * 1000:.0f}ms.")
+    database.setup_database()
+    guild_cache.warm()
+
+pattern_registry = regex_engine.PatternRegistry(max_size=GUILD_CACHE_SIZE)
+rule_registry = regex_engine.RuleMatcherRegistry(max_size=GUILD_CACHE_SIZE)
+MAX_RULES_PER_SERVER = 50
+# discord rejects messages longer than this, so rule replies are capped at it
+DISCORD_MESSAGE_LIMIT = 2000
+
+# regex evaluation: "sandbox" in worker processes with a hard time budget, or "inline" on the
+# event loop (faster, but a pattern the static check misses can stall every guild until it finishes)
+regex_runner = regex_engine.RegexRunner(
+    mode=os.getenv("REGEX_MODE", "sandbox"),
+    timeout=int(os.getenv("REGEX_TIMEOUT_MS", "50")) / 1000,
+    workers=int(os.getenv("REGEX_WORKERS", "2")),
+    quarantine_strikes=int(os.getenv("REGEX_QUARANTINE_STRIKES", "3")),
+    strike_ttl=int(os.getenv("REGEX_QUARANTINE_MINUTES", "60")) * 60,
+)
+
+# how many channels receive a news drop at the same time
+FANOUT_CONCURRENCY = int(os.getenv("FANOUT_CONCURRENCY", "16"))
+# how long posted links are remembered; must outlast an article's time on a listing page or feed
+POSTED_RETENTION_DAYS = int(os.getenv("POSTED_RETENTION_DAYS", "365"))
+# per-server delivery records, written in batches instead of once per sent message
+delivery_queue = write_behind.WriteBehindQueue(async_database.save_deliveries)
+
+# sharding: SHARD_COUNT alone runs every shard in this process, SHARD_IDS (e.g. "0,1") runs
+# only those, so several processes on one host can split the shards and share bot_data.db
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None
+SHARD_IDS = [int(shard_id) for shard_id in os.getenv("SHARD_IDS", "").split(",") if shard_id.strip()] or None
+if SHARD_IDS and not SHARD_COUNT:
+    raise SystemExit("SHARD_IDS needs SHARD_COUNT to be set.")
+# each process reads the article log through its own cursor
+NEWS_CONSUMER = f"shards-{'-'.join(map(str, SHARD_IDS))}" if SHARD_IDS else database.DEFAULT_CONSUMER
+# the process running shard 0 does the once-per-cluster housekeeping: syncing commands and
+# pruning old records. news is delivered by every process to its own guilds
+PRIMARY_PROCESS = SHARD_IDS is None or 0 in SHARD_IDS
+# "inline": bot processes elect one of themselves to scrape the news (SQLite lease),
+# "external": they only deliver, and scraper_worker.py does the scraping
+SCRAPER_MODE = os.getenv("SCRAPER_MODE", "inline")
+SCRAPE_NEWS = SCRAPER_MODE != "external"
+
+# runs shutdown() before disconnecting, however the bot stops (Ctrl+C, SIGTERM or an error)
+class GracefulShutdown:
+    async def setup_hook(self):
+        loop = asyncio.get_running_loop()
+        try:
+            # deploys and process managers stop the bot with SIGTERM, which skips close() by default
+            loop.add_signal_handler(signal.SIGTERM, lambda: loop.create_task(self.close()))
+        except NotImplementedError:
+            pass  # no signal handlers on Windows event loops
+        await super().setup_hook()
+
+    async def close(self):
+        await shutdown()
+        await super().close()
+
+class DittoBot(GracefulShutdown, commands.Bot):
+    pass
+
+class ShardedDittoBot(GracefulShutdown, commands.AutoShardedBot):
+    pass
+
+# discord setup (intents & client caches come from GATEWAY_PROFILE, see gateway.py)
+client_options = gateway.client_options()
+if SHARD_COUNT:
+    bot = ShardedDittoBot(command_prefix="!", shard_count=SHARD_COUNT, shard_ids=SHARD_IDS, **client_options)
+else:
+    bot = DittoBot(command_prefix="!", **client_options)
+
+# GETS a channel from the cache, or from the API when it isn't cached
+async def resolve_channel(channel_id):
+    channel = bot.get_channel(channel_id)
+    if channel is None:
+        try:
+            channel = await bot.fetch_channel(channel_id)
+        except discord.HTTPException:
+            return None
+    return channel
 
-    articles = soup.find_all('article', class_='featured-article-preview')
-    fetched_articles = []
-    for article in articles:
-        title_tag = article.find('h2', class_='featured-article-preview__title')
-        link_tag = article.find('a', class_='featured-article-preview__poster')
-        image_tag = link_tag.find('img') if link_tag else None
-
-        if title_tag and link_tag and image_tag:
-            title = title_tag.text.strip()
-            link = link_tag.get('href')
-            if not link: 
-                continue
-            full_link = f"https://www.pokemon-zone.com{link}" if link.startswith("/") else link
-            image_url = image_tag.get('src') or ""
-            fetched_articles.append((title, full_link, image_url))
-
-    logger.info(f"Fetched {len(fetched_articles)} articles from {pocket_url}.")
-    return fetched_articles
+# True if the guild is served by a shard of this process (discord routes guilds by (id >> 22) % shard_count)
+def is_local_guild(server_id):
+    return SHARD_IDS is None or (int(server_id) >> 22) % SHARD_COUNT in SHARD_IDS
 
 # post articles
-async def post_articles(channel, articles, role_mention=None, paragraph_fetcher=None):
+async def post_articles(channel, articles, role_mention=None, stats=None, fetched_at=None, on_posted=None):
     for article in articles:
         title = article[0]
         link = article[1]
         image_url = article[2]
-        pre_fetched_paragraph = article[3] if len(article) > 3 else None
-
-        first_paragraph = ""
-        if pre_fetched_paragraph:
-            first_paragraph = pre_fetched_paragraph
-        elif paragraph_fetcher:
-            try:
-                result = paragraph_fetcher(link)
-                if asyncio.iscoroutine(result):
-                    first_paragraph = await result
-                else:
-                    first_paragraph = result
-            except Exception as e:
-                logger.error(f"Error fetching paragraph for {link}: {e}")
-                first_paragraph = ""
-
-        # try to get the full size image
-        if image_url:
-            # pattern to match -123x456.jpg/png etc at the end of the filename
-            image_url = re.sub(r'-\d+x\d+(\.[a-zA-Z]+)$', r'\1', image_url)
+        # the paragraph is fetched at scrape time, before the article is staged
+        first_paragraph = (article[3] if len(article) > 3 else None) or ""
 
         description = f"{first_paragraph}\n\nRead more at {link}"
         embed = discord.Embed(title=title, url=link, description=description)
@@ -209,65 +146,140 @@ async def post_articles(channel, articles, role_mention=None, paragraph_fetcher=
 
         try:
             if role_mention:
-                await channel.send(
-                    content=role_mention,
-                    allowed_mentions=discord.AllowedMentions(roles=True)
-                )
-            await channel.send(embed=embed)
-            await asyncio.to_thread(database.save_posted_article, link)
+                with metrics.send_seconds.time():
+                    await channel.send(
+                        content=role_mention,
+                        allowed_mentions=discord.AllowedMentions(roles=True)
+                    )
+            with metrics.send_seconds.time():
+                await channel.send(embed=embed)
+            if on_posted:
+                on_posted(link)
+            if stats is not None:
+                stats.record(fetched_at)
             logger.info(f"Posted article: {title} - {link}")
         except Exception as e:
+            metrics.send_failures.inc()
+            if stats is not None:
+                stats.failures += 1
             logger.error(f"Failed to send message in channel {channel.id}: {e}")
 
-# background task
-@tasks.loop(hours=1)
+# posts a batch of articles to one subscribed channel (one fan-out job)
+async def deliver_to_channel(server_id, channel_id, role_id, articles, label, stats, fetched_at):
+    channel = await resolve_channel(int(channel_id))
+    if not channel:
+        logger.error(f"{label} channel {channel_id} not found for server {server_id}.")
+        return
+
+    role_mention = f"<@&{role_id}>" if role_id else None
+    await post_articles(channel, articles, role_mention=role_mention, stats=stats, fetched_at=fetched_at,
+                        on_posted=functools.partial(record_delivery, server_id, channel_id))
+
+def record_delivery(server_id, channel_id, link):
+    delivery_queue.add((server_id, link, channel_id, int(time.time())))
+
+# fans one source's articles out to the subscribed channels of local guilds, skipping
+# (server_id, link) pairs that were already delivered (by an earlier, interrupted run).
+# returns False if a lookup failed and nothing was delivered
+async def deliver_articles(source, articles, fetched_at):
+    subscriptions = await async_database.get_subscriptions(source.name)
+    if subscriptions is None:
+        return False
+    subscriptions = [subscription for subscription in subscriptions if is_local_guild(subscription[0])]
+    if not subscriptions:
+        return True
+    delivered = await async_database.get_deliveries([article[1] for article in articles])
+    if delivered is None:
+        return False
+
+    stats = delivery.DeliveryStats()
+    jobs = []
+    for server_id, channel_id, role_id in subscriptions:
+        pending = [article for article in articles if (server_id, article[1]) not in delivered]
+        if pending:
+            jobs.append(functools.partial(deliver_to_channel, server_id, channel_id, role_id, pending,
+                                          source.label, stats, fetched_at))
+    await delivery.fan_out(jobs, FANOUT_CONCURRENCY)
+    stats.log_summary(source.label)
+    return True
+
+# delivers the article log entries past this process's cursor, then moves the cursor (in the same
+# transaction as the last delivery records) up to the first entry of a source that failed, so
+# those entries are read again next tick and the delivery records skip what already went out
+async def consume_articles():
+    entries = await async_database.get_log_entries(NEWS_CONSUMER)
+    if not entries:
+        return
+
+    by_source = {}
+    for entry_id, source_name, staged_at, article in entries:
+        by_source.setdefault(source_name, (staged_at, []))[1].append(article)
+    delivering = []
+    jobs = []
+    for source_name, (staged_at, articles) in by_source.items():
+        source = sources.get(source_name)
+        if source is not None:
+            # latency is measured from when the scraper staged the articles
+            fetched_at = time.monotonic() - max(0.0, time.time() - staged_at)
+            delivering.append(source_name)
+            jobs.append(deliver_articles(source, articles, fetched_at))
+    results = await asyncio.gather(*jobs, return_exceptions=True)
+    failed = set()
+    for source_name, result in zip(delivering, results):
+        if isinstance(result, Exception):
+            logger.error(f"Error while delivering {source_name} articles: {result}")
+        if result is not True:
+            failed.add(source_name)
+
+    last_id = entries[-1][0]
+    for entry_id, source_name, staged_at, article in entries:
+        if source_name in failed:
+            last_id = entry_id - 1
+            logger.warning(f"Delivery of {', '.join(sorted(failed))} articles failed, retrying them next tick.")
+            break
+    await async_database.advance_consumer(NEWS_CONSUMER, last_id, delivery_queue.drain())
+    logger.info(f"Delivery write-behind stats: {delivery_queue.stats()}")
+    logger.info(f"Guild config cache stats: {guild_cache.stats()}")
+    logger.info(f"Compiled pattern registry stats: {pattern_registry.stats()}")
+    logger.info(f"Regex runner stats: {regex_runner.stats()}")
+
+# background task: every tick, the process holding the scraper lease polls the sources
+# that are due, then every process delivers whatever new articles are in the log
+@tasks.loop(seconds=NEWS_TICK_SECONDS)
 async def check_and_post_articles():
-    logger.info("Running hourly check for new articles...")
-    posted_links = await asyncio.to_thread(database.load_posted_articles)
-
-    # PTCG
-    ptcg_channels = database.get_all_ptcg_channels()
-
-    new_ptcg_articles = []
-    all_articles = await fetch_ptcg_articles(PTCG_URL)
-    for article_data in all_articles:
-        if article_data[1] not in posted_links:
-            new_ptcg_articles.append(article_data)
-            posted_links.add(article_data[1])
-
-    if new_ptcg_articles and ptcg_channels:
-        for server_id, channel_id in ptcg_channels:
-            channel = bot.get_channel(int(channel_id))
-            if not channel:
-                logger.error(f"Channel {channel_id} not found for server {server_id}.")
-                continue
-            
-            role_id = database.get_ptcg_role(server_id)
-            role_mention = f"<@&{role_id}>" if role_id else None
-            await post_articles(channel, new_ptcg_articles, role_mention=role_mention, paragraph_fetcher=fetch_first_paragraph)
-    
-    # POCKET
-    pocket_channels = database.get_all_pocket_channels()
-
-    new_pocket_articles = []
-    all_articles = await fetch_pocket_articles(POCKET_URL)
-    for article_data in all_articles:
-        if article_data[1] not in posted_links:
-            new_pocket_articles.append(article_data)
-            posted_links.add(article_data[1])
-
-    if new_pocket_articles and pocket_channels:
-        for server_id, channel_id in pocket_channels:
-            channel = bot.get_channel(int(channel_id))
-            if not channel:
-                logger.error(f"Pocket channel {channel_id} not found for server {server_id}.")
-                continue
-            
-            role_id = database.get_pocket_role(server_id) 
-            role_mention = f"<@&{role_id}>" if role_id else None
-            await post_articles(channel, new_pocket_articles, role_mention=role_mention, paragraph_fetcher=fetch_first_paragraph)
-
-    logger.info("Finished hourly check.")
+    if SCRAPE_NEWS and await scraper.hold_lease():
+        with metrics.cycle_seconds.time("scrape"):
+            await scraper.poll_due_sources()
+    with metrics.cycle_seconds.time("deliver"):
+        await consume_articles()
+
+@check_and_post_articles.before_loop
+async def before_check_and_post_articles():
+    await bot.wait_until_ready()
+    await async_database.register_consumer(NEWS_CONSUMER)
+
+# background task: drops posted-article records older than the retention window
+@tasks.loop(hours=24)
+async def prune_posted_articles():
+    removed = await async_database.prune_posted_articles(POSTED_RETENTION_DAYS)
+    logger.info(f"Pruned {removed} posted articles older than {POSTED_RETENTION_DAYS} days.")
+
+# stops the news loops and writes out the buffered delivery records, so a bot stopped in the
+# middle of a fan-out doesn't repost to those servers after a restart; then stops the workers
+shutdown_done = False
+
+async def shutdown():
+    global shutdown_done
+    if shutdown_done:
+        return
+    shutdown_done = True
+    check_and_post_articles.cancel()
+    prune_posted_articles.cancel()
+    await delivery_queue.close()
+    await scraper.release_lease() # the next scraper takes over now instead of when the lease expires
+    regex_runner.shutdown()
+    news.shutdown_parse_pool()
+    logger.info(f"Shut down, delivery write-behind stats: {delivery_queue.stats()}")
 
 # slash commands
 # /setptcg
@@ -281,8 +293,7 @@ async def setptcg(interaction: discord.Interaction, channel: discord.TextChannel
         return
 
     server_id = str(interaction.guild_id)
-    database.save_ptcg_channel(server_id, str(channel.id))
-    database.save_ptcg_role(server_id, str(role.id))
+    await async_database.save_subscription(server_id, "ptcg", str(channel.id), str(role.id))
 
     await interaction.response.send_message(
         f"[SUCCESS] Updates will be posted in {channel.mention} and the role {role.mention} will be pinged."
@@ -297,14 +308,31 @@ async def setpocket(interaction: discord.Interaction, channel: discord.TextChann
         return
 
     server_id = str(interaction.guild_id)
-    database.save_pocket_channel(server_id, str(channel.id))
-    database.save_pocket_role(server_id, str(role.id))
+    await async_database.save_subscription(server_id, "pocket", str(channel.id), str(role.id))
 
     await interaction.response.send_message(
         f"[SUCCESS] Pocket updates will be posted in {channel.mention} and ping {role.mention}."
     )
     logger.info(f"/setpocket command run on server {server_id}. | Channel: {channel.id} - Role: {role.id}.")
 
+# /setnews
+@bot.tree.command(name="setnews", description="Set the channel and role for updates from a news source")
+@discord.app_commands.choices(source=[
+    discord.app_commands.Choice(name=source.label, value=source.name) for source in sources.SOURCES.values()
+])
+async def setnews(interaction: discord.Interaction, source: discord.app_commands.Choice[str], channel: discord.TextChannel, role: discord.Role):
+    if not interaction.user.guild_permissions.manage_channels or not interaction.user.guild_permissions.manage_roles:
+        await interaction.response.send_message("[ERROR] You need `Manage Channels` and `Manage Roles` permissions.", ephemeral=True)
+        return
+
+    server_id = str(interaction.guild_id)
+    await async_database.save_subscription(server_id, source.value, str(channel.id), str(role.id))
+
+    await interaction.response.send_message(
+        f"[SUCCESS] {source.name} updates will be posted in {channel.mention} and ping {role.mention}."
+    )
+    logger.info(f"/setnews command run on server {server_id}. | Source: {source.value} | Channel: {channel.id} - Role: {role.id}.")
+
 # # /update
 # @bot.tree.command(name="update", description="Check for news updates")
 # async def update(interaction: discord.Interaction):
@@ -342,14 +370,21 @@ async def setregex(interaction: discord.Interaction, pattern: str):
         await interaction.response.send_message("[ERROR] You must be an administrator to use this command.", ephemeral=True)
         return
     
+    server_id = str(interaction.guild_id)
     try:
-        re.compile(pattern) # validate regex pattern
+        pattern_registry.register(server_id, pattern) # validate + precompile regex pattern
     except re.error:
         await interaction.response.send_message("[ERROR] Invalid regex pattern.", ephemeral=True)
         return
 
-    server_id = str(interaction.guild_id)
-    database.save_regex_pattern(server_id, pattern)
+    reason = regex_engine.check_complexity(pattern)
+    if reason:
+        pattern_registry.invalidate(server_id)
+        await interaction.response.send_message(f"[ERROR] Regex pattern rejected: {reason}.", ephemeral=True)
+        return
+
+    await async_database.save_regex_pattern(server_id, pattern)
+    guild_cache.set_pattern(server_id, pattern)
 
     await interaction.response.send_message(f"[SUCCESS] Regex pattern set to: `{pattern}`")
 
@@ -363,7 +398,9 @@ async def removeregex(interaction: discord.Interaction):
         return
 
     server_id = str(interaction.guild_id)
-    database.remove_regex_pattern(server_id)
+    await async_database.remove_regex_pattern(server_id)
+    guild_cache.remove_pattern(server_id)
+    pattern_registry.invalidate(server_id)
 
     await interaction.response.send_message("[SUCCESS] Regex pattern removed.")
 
@@ -377,7 +414,8 @@ async def addignoredchannel(interaction: discord.Interaction, channel: discord.a
         return
 
     server_id = str(interaction.guild_id)
-    database.save_regex_ignored_channel(server_id, str(channel.id))
+    await async_database.save_regex_ignored_channel(server_id, str(channel.id))
+    guild_cache.add_ignored_channel(server_id, str(channel.id))
 
     await interaction.response.send_message(f"[SUCCESS] Channel {channel.mention} has been added to the ignored list.")
 
@@ -391,12 +429,102 @@ async def removeignoredchannel(interaction: discord.Interaction, channel: discor
         return
 
     server_id = str(interaction.guild_id)
-    database.remove_regex_ignored_channel(server_id, str(channel.id))
+    await async_database.remove_regex_ignored_channel(server_id, str(channel.id))
+    guild_cache.remove_ignored_channel(server_id, str(channel.id))
 
     await interaction.response.send_message(f"[SUCCESS] Channel {channel.mention} has been removed from the ignored list.")
 
     logger.info(f"/removeignoredchannel command run on server {server_id}. | Channel: {channel.mention}.")
 
+# /addrule
+@bot.tree.command(name="addrule", description="Add or update a named regex rule with its own reply")
+async def addrule(interaction: discord.Interaction, name: str, pattern: str, reply: str):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("[ERROR] You must be an administrator to use this command.", ephemeral=True)
+        return
+
+    server_id = str(interaction.guild_id)
+    name = name.strip().lower()
+    if not name or len(name) > 32:
+        await interaction.response.send_message("[ERROR] Rule names must be 1-32 characters long.", ephemeral=True)
+        return
+
+    try:
+        regex_engine.compile_pattern(pattern) # validate regex pattern
+    except re.error:
+        await interaction.response.send_message("[ERROR] Invalid regex pattern.", ephemeral=True)
+        return
+
+    reason = regex_engine.check_complexity(pattern)
+    if reason:
+        await interaction.response.send_message(f"[ERROR] Regex pattern rejected: {reason}.", ephemeral=True)
+        return
+
+    if not reply.strip() or len(reply) > DISCORD_MESSAGE_LIMIT:
+        await interaction.response.send_message(f"[ERROR] Rule replies must be 1-{DISCORD_MESSAGE_LIMIT} characters long.", ephemeral=True)
+        return
+
+    rules = (await guild_cache.get_config(server_id)).rules
+    if name not in rules and len(rules) >= MAX_RULES_PER_SERVER:
+        await interaction.response.send_message(f"[ERROR] A server can have at most {MAX_RULES_PER_SERVER} rules.", ephemeral=True)
+        return
+
+    await async_database.save_regex_rule(server_id, name, pattern, reply)
+    guild_cache.set_rule(server_id, name, pattern, reply)
+
+    await interaction.response.send_message(f"[SUCCESS] Rule `{name}` set to: `{pattern}`")
+
+    logger.info(f"/addrule command run on server {server_id}. | Rule: {name} | Pattern: {pattern}.")
+
+# /removerule
+@bot.tree.command(name="removerule", description="Remove a named regex rule")
+async def removerule(interaction: discord.Interaction, name: str):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("[ERROR] You must be an administrator to use this command.", ephemeral=True)
+        return
+
+    server_id = str(interaction.guild_id)
+    name = name.strip().lower()
+    if not await async_database.remove_regex_rule(server_id, name):
+        await interaction.response.send_message(f"[ERROR] No rule named `{name}`.", ephemeral=True)
+        return
+    guild_cache.remove_rule(server_id, name)
+
+    await interaction.response.send_message(f"[SUCCESS] Rule `{name}` removed.")
+
+    logger.info(f"/removerule command run on server {server_id}. | Rule: {name}.")
+
+# splits lines into messages that fit discord's length limit
+def paginate(lines, limit=DISCORD_MESSAGE_LIMIT):
+    pages = [""]
+    for line in lines:
+        line = line[:limit]
+        if pages[-1] and len(pages[-1]) + 1 + len(line) > limit:
+            pages.append("")
+        pages[-1] = f"{pages[-1]}\n{line}" if pages[-1] else line
+    return pages
+
+# /listrules
+@bot.tree.command(name="listrules", description="Lists all regex rules of this server")
+async def listrules(interaction: discord.Interaction):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("[ERROR] You must be an administrator to use this command.", ephemeral=True)
+        return
+
+    server_id = str(interaction.guild_id)
+    rules = (await guild_cache.get_config(server_id)).rules
+
+    if rules:
+        lines = ["Regex rules:"] + [f"**{name}** - `{pattern}`" for name, (pattern, reply) in sorted(rules.items())]
+        pages = paginate(lines)
+        await interaction.response.send_message(pages[0], ephemeral=True)
+        for page in pages[1:]:
+            await interaction.followup.send(page, ephemeral=True)
+    else:
+        await interaction.response.send_message("No regex rules are currently set.", ephemeral=True)
+
+    logger.info(f"/listrules command run on server {server_id}.")
+
 # /listignoredchannels
 @bot.tree.command(name="listignoredchannels", description="Lists all channels ignored by the regex check")
 async def listignoredchannels(interaction: discord.Interaction):
@@ -405,7 +533,7 @@ async def listignoredchannels(interaction: discord.Interaction):
         return
 
     server_id = str(interaction.guild_id)
-    ignored_channels = database.get_regex_ignored_channels(server_id)
+    ignored_channels = await async_database.get_regex_ignored_channels(server_id)
 
     if ignored_channels:
         channels = [f"<#{channel_id}>" for channel_id in ignored_channels]
@@ -417,14 +545,48 @@ async def listignoredchannels(interaction: discord.Interaction):
 
     logger.info(f"/listignoredchannels command run on server {server_id}.")
 
+# COMMAND TREE SYNC
+COMMAND_TREE_HASH_KEY = "command_tree_hash"
+
+# hash of the global command definitions as they are sent to discord
+def command_tree_hash():
+    payload = sorted((command.to_dict(bot.tree) for command in bot.tree.get_commands()), key=lambda c: (c["type"], c["name"]))
+    return hashlib.sha256(json.dumps([bot.application_id, payload], sort_keys=True).encode()).hexdigest()
+
+# syncs the command tree only when its definitions changed since the last sync (a global sync
+# is slow and rate limited, and on_ready runs again on every reconnect)
+async def sync_command_tree():
+    tree_hash = command_tree_hash()
+    if await async_database.get_meta(COMMAND_TREE_HASH_KEY) == tree_hash:
+        logger.info("Command tree unchanged since the last sync, skipping it.")
+        return
+    start = time.perf_counter()
+    await bot.tree.sync()
+    await async_database.set_meta(COMMAND_TREE_HASH_KEY, tree_hash)
+    logger.info(f"Synced the command tree in {time.perf_counter() - start:.1f}s.")
+
 # EVENTS
+# /metrics endpoint, started on first login when METRICS_PORT is set
+metrics_server = None
+# set once the first on_ready has run (later ones are reconnects)
+first_ready_done = False
+
 # log in event
 @bot.event
 async def on_ready():
-    await bot.tree.sync()
+    global metrics_server, first_ready_done
+    if metrics_server is None:
+        metrics_server = await metrics.start_server()
+    if PRIMARY_PROCESS and not first_ready_done:
+        await sync_command_tree()
     if not check_and_post_articles.is_running():
         check_and_post_articles.start()
+    if PRIMARY_PROCESS and not prune_posted_articles.is_running():
+        prune_posted_articles.start()
     logger.info(f"Logged in as {bot.user}")
+    if not first_ready_done:
+        first_ready_done = True
+        logger.info(f"Ready in {time.perf_counter() - STARTED_AT:.1f}s after start, {len(bot.guilds)} guilds.")
 
 # new server welcome event
 @bot.event
@@ -439,6 +601,7 @@ async def on_guild_join(guild):
                     "__News Updates__\n"
                     "**/setptcg <channel> <role>** - Set the channel and role for **PTCG** news updates.\n"
                     "**/setpocket <channel> <role>** - Set the channel and role for **PTCG Pocket** news updates.\n"
+                    "**/setnews <source> <channel> <role>** - Set the channel and role for any supported news source.\n"
                     # "**/update** - Check for news updates.\n\n"
                     "__Regex__\n"
                     "**/setregex <pattern>** - Set a regex pattern for word checking.\n"
@@ -446,6 +609,9 @@ async def on_guild_join(guild):
                     "**/addignoredchannel <channel>** - Add a channel to be ignored by the regex check.\n"
                     "**/removeignoredchannel <channel>** - Remove a channel to be ignored by the regex check.\n"
                     "**/listignoredchannels** - Lists all channels ignored by the regex check.\n"
+                    "**/addrule <name> <pattern> <reply>** - Add a named regex rule with its own reply.\n"
+                    "**/removerule <name>** - Remove a named regex rule.\n"
+                    "**/listrules** - Lists all regex rules.\n"
                     "**/trading** - Manual command to tell users how to access the trading channels.\n\n"
                     "If you need help, please create a ticket in the Pokémon TCG/Live/Pocket Community."
                 )
@@ -456,12 +622,16 @@ async def on_guild_join(guild):
         
         # if audit log check fails just send the msg to the owner
         owner = guild.owner
+        if owner is None and guild.owner_id:
+            # not cached without the members intent
+            owner = await bot.fetch_user(guild.owner_id)
         if owner:
             message = (
                 f"Hey {owner.name}! Here are some tips to get me set up in your server.\n\n"
                 "__News Updates__\n"
                 "**/setptcg <channel> <role>** - Set the channel and role for **PTCG** news updates.\n"
                 "**/setpocket <channel> <role>** - Set the channel and role for **PTCG Pocket** news updates.\n"
+                "**/setnews <source> <channel> <role>** - Set the channel and role for any supported news source.\n"
                 # "**/update** - Check for news updates.\n\n"
                 "__Regex__\n"
                 "**/setregex <pattern>** - Set a regex pattern for word checking.\n"
@@ -469,6 +639,9 @@ async def on_guild_join(guild):
                 "**/addignoredchannel <channel>** - Add a channel to be ignored by the regex check.\n"
                 "**/removeignoredchannel <channel>** - Remove a channel to be ignored by the regex check.\n"
                 "**/listignoredchannels** - Lists all channels ignored by the regex check.\n"
+                "**/addrule <name> <pattern> <reply>** - Add a named regex rule with its own reply.\n"
+                "**/removerule <name>** - Remove a named regex rule.\n"
+                "**/listrules** - Lists all regex rules.\n"
                 "**/trading** - Manual command to tell users how to access the trading channels.\n\n"
                 "If you need help, please create a ticket in the Pokémon TCG/Live/Pocket Community."
             )
@@ -482,6 +655,10 @@ async def on_guild_join(guild):
 # regex check event
 @bot.event
 async def on_message(message):
+    with metrics.messages_seconds.time():
+        await handle_message(message)
+
+async def handle_message(message):
     if message.author.bot:
         return  # ignore messages from other bots
     
@@ -489,7 +666,8 @@ async def on_message(message):
         return
 
     server_id = str(message.guild.id)
-    ignored_channels = database.get_regex_ignored_channels(server_id)
+    config = await guild_cache.get_config(server_id)
+    ignored_channels = config.ignored_channels
 
     # check if the message's channel or its parent (for forum posts) is ignored
     if str(message.channel.id) in ignored_channels or (
@@ -497,15 +675,26 @@ async def on_message(message):
     ):
         return
 
-    pattern = database.get_regex_pattern(server_id)
-    if pattern and re.search(pattern, message.content, re.IGNORECASE):
+    compiled = pattern_registry.get_compiled(server_id, config.pattern) if config.pattern else None
+    if compiled and await regex_runner.search(server_id, compiled, message.content):
         await message.reply(
             "Hey! It seems like you're looking to trade cards.\n\n"
             "We already have a specific channel for trading in PTCG Pocket so please read the post titled **READ ME** at the top of <#1334205216320655483> for more information.\n"
             "If you're unable to make a listing, please grab the **Union Room** role at <#908131369085968394>!"
         )
         logger.info(f"Regex match triggered at server {server_id}.")
+    elif config.rules:
+        for rule_name, reply, rule_pattern in rule_registry.get_matcher(server_id, config).candidates(message.content):
+            if await regex_runner.search(server_id, rule_pattern, message.content):
+                # replies saved before /addrule capped their length
+                await message.reply(reply[:DISCORD_MESSAGE_LIMIT], allowed_mentions=discord.AllowedMentions.none())
+                logger.info(f"Regex rule {rule_name} triggered at server {server_id}.")
+                break
 
     await bot.process_commands(message)
 
-bot.run(TOKEN)
\ No newline at end of file
+if __name__ == "__main__":
+    try:
+        bot.run(TOKEN)
+    finally:
+        async_database.shutdown()
@@ -0,0 +1,230 @@
+import logging
+import importlib.util
+
+from html.parser import HTMLParser
+from collections import namedtuple
+
+logger = logging.getLogger("dittologger")
+
+# bs4 and lxml are only imported by the first parse that needs them, so processes that never
+# parse HTML (or haven't yet) don't pay for them at startup
+HAS_LXML = importlib.util.find_spec("lxml") is not None
+
+def _soup(*args, **kwargs):
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(*args, **kwargs)
+
+def _strainer(*args, **kwargs):
+    from bs4 import SoupStrainer
+    return SoupStrainer(*args, **kwargs)
+
+# "html.parser" builds the full tree like the original fetchers did, "strainer" only builds the
+# <article> subtrees, "lxml" does the same with the C parser (needs lxml installed) and
+# "incremental" streams the page and stops at the first qualifying paragraph (paragraphs only).
+# "auto" picks the fastest one available
+ENGINES = ("auto", "html.parser", "strainer", "lxml", "incremental")
+
+# how a news source's listing page is laid out, declared once per source
+ListingSelectors = namedtuple("ListingSelectors", [
+    "article",        # (tag, class or None) of each article card
+    "title",          # (tag, class or None) inside the card
+    "link",           # (tag, class or None) inside the card
+    "image_in_link",  # look for the <img> inside the link tag instead of the whole card
+    "require_image",  # skip cards without an image
+    "base_url",       # prefix for relative links, or None
+])
+
+PTCG_LISTING = ListingSelectors(
+    article=("article", None),
+    title=("h2", None),
+    link=("a", None),
+    image_in_link=False,
+    require_image=False,
+    base_url=None,
+)
+
+POCKET_LISTING = ListingSelectors(
+    article=("article", "featured-article-preview"),
+    title=("h2", "featured-article-preview__title"),
+    link=("a", "featured-article-preview__poster"),
+    image_in_link=True,
+    require_image=True,
+    base_url="https://www.pokemon-zone.com",
+)
+
+# content containers checked (in order) when an article page has no <p> inside <article>
+CONTENT_CLASSES = ('media-block__primary', 'entry-content', 'post-content', 'content')
+MIN_FALLBACK_PARAGRAPH = 50
+
+def _find(tag, selector):
+    name, class_name = selector
+    return tag.find(name, class_=class_name) if class_name else tag.find(name)
+
+def _listing_soup(body, selectors, engine):
+    name, class_name = selectors.article
+    if engine == "html.parser":
+        return _soup(body, 'html.parser')
+    strainer = _strainer(name, class_=class_name) if class_name else _strainer(name)
+    return _soup(body, 'lxml' if engine == "lxml" else 'html.parser', parse_only=strainer)
+
+def resolve_engine(engine, for_paragraph=False):
+    if engine == "auto":
+        if for_paragraph:
+            return "incremental"
+        return "lxml" if HAS_LXML else "strainer"
+    if engine == "lxml" and not HAS_LXML:
+        logger.warning("lxml engine requested but lxml is not installed, falling back to strainer.")
+        return "strainer"
+    if engine == "incremental" and not for_paragraph:
+        return "lxml" if HAS_LXML else "strainer"
+    return engine
+
+# EXTRACTS (title, link, image_url) tuples from a listing page
+def extract_articles(body, selectors, engine="auto"):
+    engine = resolve_engine(engine)
+    soup = _listing_soup(body, selectors, engine)
+
+    name, class_name = selectors.article
+    cards = soup.find_all(name, class_=class_name) if class_name else soup.find_all(name)
+    fetched_articles = []
+    for card in cards:
+        title_tag = _find(card, selectors.title)
+        link_tag = _find(card, selectors.link)
+        if selectors.image_in_link:
+            image_tag = link_tag.find('img') if link_tag else None
+        else:
+            image_tag = card.find('img')
+
+        if not title_tag or not link_tag or (selectors.require_image and not image_tag):
+            continue
+        link = link_tag.get('href')
+        if not link:
+            continue
+        if selectors.base_url and link.startswith("/"):
+            link = f"{selectors.base_url}{link}"
+        image_url = (image_tag.get('src') or "") if image_tag else ""
+        fetched_articles.append((title_tag.text.strip(), link, image_url))
+    return fetched_articles
+
+def _first_paragraph_from_soup(soup):
+    # 1 // look for <p> inside <article>
+    article_body = soup.find('article')
+    if article_body:
+        p = article_body.find('p')
+        if p and p.text.strip():
+            return p.text.strip()
+
+    # 2 // look for <p> inside common content divs
+    for class_name in CONTENT_CLASSES:
+        content_div = soup.find('div', class_=class_name)
+        if content_div:
+            p = content_div.find('p')
+            if p and p.text.strip():
+                return p.text.strip()
+
+    # 3 // find the first substantial paragraph in the body
+    for p in soup.find_all('p'):
+        text = p.text.strip()
+        if len(text) > MIN_FALLBACK_PARAGRAPH:
+            return text
+    return None
+
+class _StopParsing(Exception):
+    pass
+
+# streaming version of _first_paragraph_from_soup: same three tiers, but it never builds a
+# tree and stops as soon as the first <article> yields a paragraph, which is the common case
+class _ParagraphParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.article_state = None  # None -> "open" -> "closed" for the first <article>
+        self.article_depth = 0
+        self.tier1 = None          # text of the first <p> in the first <article> ("" if empty/missing)
+        self.seen_classes = set()
+        self.div_stack = []        # per open <div>: indexes of CONTENT_CLASSES it is the first of
+        self.tier2 = {}            # {class index: text of the first <p> in that div}
+        self.tier3 = None
+        self.p_depth = 0
+        self.p_text = []
+        self.p_targets = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'article':
+            if self.article_state is None:
+                self.article_state = "open"
+            if self.article_state == "open":
+                self.article_depth += 1
+        elif tag == 'div':
+            classes = (dict(attrs).get('class') or "").split()
+            firsts = []
+            for index, class_name in enumerate(CONTENT_CLASSES):
+                if index not in self.seen_classes and class_name in classes:
+                    self.seen_classes.add(index)
+                    firsts.append(index)
+            self.div_stack.append(firsts)
+        elif tag == 'p':
+            if self.p_depth == 0:
+                self.p_text = []
+                self.p_targets = (
+                    self.article_state == "open" and self.tier1 is None,
+                    [i for firsts in self.div_stack for i in firsts if i not in self.tier2],
+                )
+            self.p_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag == 'article' and self.article_state == "open":
+            self.article_depth -= 1
+            if self.article_depth == 0:
+                self.article_state = "closed"
+                if self.tier1 is None:
+                    self.tier1 = ""
+        elif tag == 'div' and self.div_stack:
+            for index in self.div_stack.pop():
+                self.tier2.setdefault(index, "")
+        elif tag == 'p' and self.p_depth:
+            self.p_depth -= 1
+            if self.p_depth == 0:
+                self._paragraph_done("".join(self.p_text).strip())
+
+    def handle_data(self, data):
+        if self.p_depth:
+            self.p_text.append(data)
+
+    def _paragraph_done(self, text):
+        in_article, divs = self.p_targets
+        for index in divs:
+            self.tier2.setdefault(index, text)
+        if self.tier3 is None and len(text) > MIN_FALLBACK_PARAGRAPH:
+            self.tier3 = text
+        if in_article:
+            self.tier1 = text
+            if text:
+                raise _StopParsing()
+
+    def result(self):
+        if self.tier1:
+            return self.tier1
+        for index in range(len(CONTENT_CLASSES)):
+            if self.tier2.get(index):
+                return self.tier2[index]
+        return self.tier3
+
+# EXTRACTS the first meaningful paragraph of an article page, or None if there is none
+def extract_first_paragraph(body, engine="auto", chunk_size=16384):
+    engine = resolve_engine(engine, for_paragraph=True)
+    if engine == "incremental":
+        parser = _ParagraphParser()
+        try:
+            for start in range(0, len(body), chunk_size):
+                parser.feed(body[start:start + chunk_size])
+            parser.close()
+        except _StopParsing:
+            pass
+        return parser.result()
+
+    if engine == "strainer":
+        # only these three tags matter for the paragraph tiers
+        soup = _soup(body, 'html.parser', parse_only=_strainer(['article', 'div', 'p']))
+    else:
+        soup = _soup(body, 'lxml' if engine == "lxml" else 'html.parser')
+    return _first_paragraph_from_soup(soup)
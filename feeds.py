@@ -0,0 +1,135 @@
+import re
+import xml.etree.ElementTree as ET
+
+from html.parser import HTMLParser
+
+MAX_FEED_ITEMS = 30
+FEED_CHUNK_SIZE = 16384
+# the part of an RSS feed that changes when a post is published (lastBuildDate sits above it)
+SECTION_MARKERS = ("<item", "</channel>")
+
+_NAMESPACES = {
+    "atom": "http://www.w3.org/2005/Atom",
+    "content": "http://purl.org/rss/1.0/modules/content/",
+    "media": "http://search.yahoo.com/mrss/",
+}
+_IMG_SRC = re.compile(r"""<img[^>]+src=["']([^"']+)["']""", re.IGNORECASE)
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+class _FoundParagraph(Exception):
+    pass
+
+# first non-empty <p> of an HTML snippet (feed bodies are escaped HTML); stops parsing as
+# soon as it is found so the rest of a full post in content:encoded is never tokenised.
+# only text inside <p> counts (not a figcaption or heading above it); a snippet without any
+# <p>, like a plain text description, is taken whole
+class _ParagraphFinder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.in_paragraph = False
+        self.seen_paragraph = False
+
+    def _flush(self):
+        text = " ".join("".join(self.parts).split())
+        self.parts = []
+        if text:
+            raise _FoundParagraph(text)
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'p':
+            if self.in_paragraph:
+                self._flush()  # an unclosed <p> ends where the next one starts
+            self.parts = []
+            self.in_paragraph = True
+            self.seen_paragraph = True
+
+    def handle_endtag(self, tag):
+        if tag == 'p' and self.in_paragraph:
+            self.in_paragraph = False
+            self._flush()
+
+    def handle_data(self, data):
+        if self.in_paragraph or not self.seen_paragraph:
+            self.parts.append(data)
+
+    def result(self):
+        if self.in_paragraph or not self.seen_paragraph:
+            self._flush()
+
+def _first_paragraph(snippet):
+    parser = _ParagraphFinder()
+    try:
+        parser.feed(snippet)
+        parser.close()
+        parser.result()
+    except _FoundParagraph as found:
+        return found.args[0]
+    return ""
+
+# first paragraph of the full post, or of the description when the feed has no content
+def _summary(content_html, description):
+    for snippet in (content_html, description):
+        if snippet:
+            paragraph = _first_paragraph(snippet)
+            if paragraph:
+                return paragraph
+    return ""
+
+def _image(item, content_html):
+    for tag in ("media:content", "media:thumbnail"):
+        media = item.find(tag, _NAMESPACES)
+        if media is not None and media.get("url"):
+            return media.get("url")
+    enclosure = item.find("enclosure")
+    if enclosure is not None and (enclosure.get("type") or "").startswith("image/"):
+        return enclosure.get("url") or ""
+    if content_html:
+        match = _IMG_SRC.search(content_html)
+        if match:
+            return match.group(1)
+    return ""
+
+def _rss_item(item):
+    title = (item.findtext("title") or "").strip()
+    link = (item.findtext("link") or "").strip()
+    content_html = item.findtext("content:encoded", namespaces=_NAMESPACES)
+    description = item.findtext("description")
+    return title, link, _image(item, content_html), _summary(content_html, description)
+
+def _atom_entry(entry):
+    title = (entry.findtext("atom:title", namespaces=_NAMESPACES) or "").strip()
+    link = ""
+    for link_tag in entry.findall("atom:link", _NAMESPACES):
+        if link_tag.get("rel", "alternate") == "alternate":
+            link = link_tag.get("href") or ""
+            break
+    content_html = entry.findtext("atom:content", namespaces=_NAMESPACES)
+    summary = entry.findtext("atom:summary", namespaces=_NAMESPACES)
+    return title, link, _image(entry, content_html), _summary(content_html, summary)
+
+# PARSES an RSS 2.0 or Atom feed incrementally, returns [(title, link, image_url, paragraph), ...].
+# each item is converted and cleared as soon as its end tag arrives, and parsing stops after
+# max_items, so memory stays flat no matter how long the feed is
+def parse_feed(body, max_items=MAX_FEED_ITEMS):
+    parser = ET.XMLPullParser(events=("end",))
+    articles = []
+    for start in range(0, len(body), FEED_CHUNK_SIZE):
+        parser.feed(body[start:start + FEED_CHUNK_SIZE])
+        for _, element in parser.read_events():
+            tag = _local(element.tag)
+            if tag == "item":
+                article = _rss_item(element)
+            elif tag == "entry":
+                article = _atom_entry(element)
+            else:
+                continue
+            element.clear()
+            if article[0] and article[1]:
+                articles.append(article)
+            if len(articles) >= max_items:
+                return articles
+    parser.close()
+    return articles
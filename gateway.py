@@ -0,0 +1,33 @@
+import os
+import discord
+
+# "full": discord.py's default intents and caches.
+# "lean": only what the bot uses, i.e. guilds (channel lookups, join events) and guild messages
+# with their content (regex checks). no message cache, no member cache, no member chunking;
+# anything that may miss the cache is fetched from the API on demand
+GATEWAY_PROFILE = os.getenv("GATEWAY_PROFILE", "full")
+PROFILES = ("full", "lean")
+
+def intents_for(profile):
+    if profile == "lean":
+        intents = discord.Intents.none()
+        intents.guilds = True
+        intents.guild_messages = True
+    else:
+        intents = discord.Intents.default()
+        intents.messages = True
+    intents.message_content = True
+    return intents
+
+# keyword arguments for discord.Client / commands.Bot under a gateway profile
+def client_options(profile=GATEWAY_PROFILE):
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown gateway profile {profile!r}, expected one of {', '.join(PROFILES)}.")
+    options = {"intents": intents_for(profile)}
+    if profile == "lean":
+        options.update(
+            max_messages=None,
+            chunk_guilds_at_startup=False,
+            member_cache_flags=discord.MemberCacheFlags.none(),
+        )
+    return options
@@ -0,0 +1,220 @@
+import time
+import queue
+import asyncio
+import hashlib
+import logging
+import threading
+import metrics
+
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("dittologger")
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Referer': 'https://www.google.com/'
+}
+REQUEST_TIMEOUT = 15
+SESSIONS_PER_HOST = 2
+# how long a request waits for a busy host's session before giving up, a couple of requests' worth
+SESSION_WAIT_TIMEOUT = 2 * REQUEST_TIMEOUT
+# pokebeach, pokemon-zone and their CDN hosts, with room to spare
+EXPECTED_HOSTS = 4
+
+# cloudscraper is imported when the first session is created, not at startup
+def create_scraper():
+    import cloudscraper
+    return cloudscraper.create_scraper()
+
+# long-lived scraper sessions, a few per host. a session keeps its TLS connections,
+# cookies and Cloudflare clearance between requests, and is checked out by one thread at a time
+class SessionPool:
+    def __init__(self, per_host=SESSIONS_PER_HOST, factory=create_scraper):
+        self.per_host = per_host
+        self.factory = factory
+        self._idle = {}    # {host: LifoQueue of sessions}
+        self._counts = {}  # {host: sessions created}
+        self._lock = threading.Lock()
+        self.created = 0
+
+    @contextmanager
+    def session(self, host):
+        with self._lock:
+            idle = self._idle.setdefault(host, queue.LifoQueue())
+            can_create = idle.empty() and self._counts.get(host, 0) < self.per_host
+            if can_create:
+                self._counts[host] = self._counts.get(host, 0) + 1
+                self.created += 1
+
+        if can_create:
+            try:
+                session = self.factory()
+            except Exception:
+                self._release(host)
+                with self._lock:
+                    self.created -= 1
+                raise
+        else:
+            try:
+                session = idle.get(timeout=SESSION_WAIT_TIMEOUT)
+            except queue.Empty:
+                raise TimeoutError(f"No free session for {host} after {SESSION_WAIT_TIMEOUT}s") from None
+        try:
+            yield session
+        except Exception:
+            # drop a session that errored, its connection state may be broken
+            session.close()
+            try:
+                session = self.factory()
+            except Exception:
+                # no replacement, give the slot back so the next request creates one
+                session = None
+                self._release(host)
+            raise
+        finally:
+            if session is not None:
+                idle.put(session)
+
+    # frees a host slot whose session is gone, after close() the counts are already cleared
+    def _release(self, host):
+        with self._lock:
+            if self._counts.get(host):
+                self._counts[host] -= 1
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                while not idle.empty():
+                    idle.get_nowait().close()
+            self._idle.clear()
+            self._counts.clear()
+
+session_pool = SessionPool()
+_executor = ThreadPoolExecutor(max_workers=SESSIONS_PER_HOST * EXPECTED_HOSTS, thread_name_prefix="scraper")
+
+def _sync_get(url, headers=None):
+    host = urlsplit(url).netloc
+    start = time.perf_counter()
+    with session_pool.session(host) as session:
+        r = session.get(url, headers=headers or HEADERS, timeout=REQUEST_TIMEOUT)
+    metrics.http_seconds.observe(time.perf_counter() - start, host)
+    metrics.http_responses.inc(host, r.status_code)
+    metrics.http_bytes.inc(host, amount=len(r.content))
+    return r.status_code, r.text, r.headers
+
+# GETS a page through the shared session pool, returns (status, body)
+async def fetch(url, headers=None):
+    loop = asyncio.get_running_loop()
+    status, body, _ = await loop.run_in_executor(_executor, _sync_get, url, headers)
+    return status, body
+
+def _sync_head(url):
+    host = urlsplit(url).netloc
+    start = time.perf_counter()
+    with session_pool.session(host) as session:
+        r = session.head(url, headers=HEADERS, timeout=REQUEST_TIMEOUT, allow_redirects=True)
+    metrics.http_seconds.observe(time.perf_counter() - start, host)
+    metrics.http_responses.inc(host, r.status_code)
+    return r.status_code, r.headers
+
+# HEAD request through the shared session pool (redirects followed), returns (status, headers)
+async def head(url):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _sync_head, url)
+
+NOT_MODIFIED = 304
+
+# ETag/Last-Modified validators and a hash of the relevant HTML section per source URL,
+# so an unchanged homepage costs a conditional request and no parse.
+# what a changed page brings is held as pending until the caller commits it (once the page's
+# articles are safely staged); a failed poll discards it, so the next poll sees the page as changed
+class ChangeTracker:
+    def __init__(self):
+        self._validators = {}  # {url: (etag, last_modified)}
+        self._hashes = {}      # {url: digest of the relevant section}
+        self._pending = {}     # {url: (validators or None, digest)}
+        self.checks = 0
+        self.not_modified = 0
+        self.unchanged = 0
+
+    def headers_for(self, url):
+        headers = dict(HEADERS)
+        etag, last_modified = self._validators.get(url, (None, None))
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    @staticmethod
+    def _section_digest(body, start_marker, end_marker):
+        start = body.find(start_marker)
+        end = body.rfind(end_marker)
+        section = body[start:end] if start != -1 and end > start else body
+        return hashlib.blake2b(section.encode("utf-8", "replace"), digest_size=16).digest()
+
+    # returns True if the section between the markers hashes the same as the last committed fetch,
+    # otherwise keeps the new validators & hash pending
+    def check_changed(self, url, body, response_headers, start_marker, end_marker):
+        etag = response_headers.get('ETag')
+        last_modified = response_headers.get('Last-Modified')
+        validators = (etag, last_modified) if etag or last_modified else None
+        digest = self._section_digest(body, start_marker, end_marker)
+        self._pending[url] = (validators, digest)
+        if self._hashes.get(url) == digest:
+            # nothing new on the page, the fresh validators are safe to keep right away
+            self.commit(url)
+            return False
+        return True
+
+    # SAVES the pending validators & hash of a url, after its articles were staged
+    def commit(self, url):
+        pending = self._pending.pop(url, None)
+        if pending is None:
+            return
+        validators, digest = pending
+        if validators:
+            self._validators[url] = validators
+        self._hashes[url] = digest
+
+    # REMOVES the pending validators & hash of a url whose poll failed
+    def discard(self, url):
+        self._pending.pop(url, None)
+
+    def stats(self):
+        skipped = self.not_modified + self.unchanged
+        return {
+            "checks": self.checks,
+            "not_modified": self.not_modified,
+            "unchanged": self.unchanged,
+            "skip_rate": round(skipped / self.checks, 4) if self.checks else 0.0,
+        }
+
+change_tracker = ChangeTracker()
+
+# GETS a listing page only if it changed, returns (status, body).
+# status is NOT_MODIFIED (body None) when the server answered 304 or the section between
+# the markers is byte-for-byte the same as on the last committed fetch (see ChangeTracker)
+async def fetch_if_changed(url, start_marker, end_marker):
+    loop = asyncio.get_running_loop()
+    status, body, response_headers = await loop.run_in_executor(
+        _executor, _sync_get, url, change_tracker.headers_for(url)
+    )
+    change_tracker.checks += 1
+    if status == NOT_MODIFIED:
+        change_tracker.not_modified += 1
+        metrics.conditional_fetches.inc("not_modified")
+        return NOT_MODIFIED, None
+    if status != 200:
+        metrics.conditional_fetches.inc("error")
+        return status, body
+
+    if not change_tracker.check_changed(url, body, response_headers, start_marker, end_marker):
+        change_tracker.unchanged += 1
+        metrics.conditional_fetches.inc("unchanged")
+        return NOT_MODIFIED, None
+    metrics.conditional_fetches.inc("changed")
+    return status, body
@@ -0,0 +1,104 @@
+import os
+import json
+import queue
+import atexit
+import logging
+
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# "text" or "json" (one object per line)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# records waiting for the writer thread; when it's full new records are dropped, not waited on
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# most records written between two flushes of the log file
+LOG_BATCH_SIZE = 256
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        return json.dumps(entry, ensure_ascii=False)
+
+# never blocks the caller: a record that doesn't fit in the queue is counted and dropped
+class BoundedQueueHandler(QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+# flushes only when the listener says so, once per batch instead of once per record
+class _BatchedRotatingFileHandler(RotatingFileHandler):
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+# writes whatever has queued up in one go on its own thread, then flushes once,
+# and reports records the queue handler had to drop since the last batch
+class BatchingQueueListener(QueueListener):
+    def __init__(self, log_queue, queue_handler, *handlers):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.queue_handler = queue_handler
+        self._reported_drops = 0
+
+    # the stop sentinel has to get through even when the queue is full
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+    def _monitor(self):
+        has_task_done = hasattr(self.queue, 'task_done')
+        stopping = False
+        while not stopping:
+            batch = [self.dequeue(True)]
+            while len(batch) < LOG_BATCH_SIZE:
+                try:
+                    batch.append(self.dequeue(False))
+                except queue.Empty:
+                    break
+
+            dropped = self.queue_handler.dropped - self._reported_drops
+            if dropped:
+                self._reported_drops += dropped
+                self.handle(logging.makeLogRecord({
+                    "name": "dittologger", "levelno": logging.WARNING, "levelname": "WARNING",
+                    "msg": f"Log queue full, dropped {dropped} records.",
+                }))
+            for record in batch:
+                if record is self._sentinel:
+                    stopping = True
+                else:
+                    self.handle(record)
+            for handler in self.handlers:
+                if hasattr(handler, 'flush_batch'):
+                    handler.flush_batch()
+            if has_task_done:
+                for _ in batch:
+                    self.queue.task_done()
+
+# routes a logger through a bounded queue to a rotating log file written off-thread, so
+# logging from the event loop never waits on disk I/O or log rotation
+def setup_logging(logger, log_file):
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = BoundedQueueHandler(log_queue)
+
+    file_handler = _BatchedRotatingFileHandler(log_file, maxBytes=100 * 1024 * 1024, backupCount=100)
+    file_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+
+    logger.setLevel(logging.INFO)
+    logger.addHandler(queue_handler)
+    listener = BatchingQueueListener(log_queue, queue_handler, file_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,142 @@
+import os
+import time
+import bisect
+import logging
+import threading
+
+from contextlib import contextmanager
+
+logger = logging.getLogger("dittologger")
+
+# local port of the /metrics endpoint; 0 turns metrics off (nothing is recorded or served)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+ENABLED = METRICS_PORT > 0
+
+# seconds; from a fast cache hit up to a slow page fetch
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+
+def _label_text(labelnames, labels):
+    if not labelnames:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labelnames, labels)) + "}"
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    # sum of the counter across all label values
+    def total(self):
+        with self._lock:
+            return sum(self._values.values())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, labels)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        if not ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    # number of observations, across all label values
+    def count(self):
+        with self._lock:
+            return sum(series[-1] for series in self._series.values())
+
+    # times the body of a with block
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, series):
+                    cumulative += bucket_count
+                    bucket_labels = _label_text(self.labelnames + ("le",), labels + (bound,))
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames + ('le',), labels + ('+Inf',))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_label_text(self.labelnames, labels)} {series[-2]}")
+                lines.append(f"{self.name}_count{_label_text(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+# every metric in the Prometheus text exposition format
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# hot-path metrics, shared by every module
+messages_seconds = Histogram("ditto_message_seconds", "Time spent handling one on_message event.")
+regex_seconds = Histogram("ditto_regex_seconds", "Time spent evaluating one regex search.", ("mode",))
+regex_timeouts = Counter("ditto_regex_timeouts_total", "Regex searches that ran over their time budget.")
+db_seconds = Histogram("ditto_db_seconds", "Time from issuing a database call to getting its result.", ("operation",))
+http_seconds = Histogram("ditto_http_seconds", "Duration of outgoing HTTP requests.", ("host",))
+http_responses = Counter("ditto_http_responses_total", "Outgoing HTTP responses.", ("host", "status"))
+conditional_fetches = Counter("ditto_conditional_fetches_total",
+                              "Listing and feed fetches by result: changed, not_modified (304), unchanged "
+                              "(same section hash, parse skipped) or error.", ("result",))
+http_bytes = Counter("ditto_http_response_bytes_total", "Bytes received from outgoing HTTP requests.", ("host",))
+parse_seconds = Histogram("ditto_parse_seconds", "Time spent extracting articles or paragraphs.", ("kind",))
+send_seconds = Histogram("ditto_discord_send_seconds", "Latency of one Discord message send.")
+send_failures = Counter("ditto_discord_send_failures_total", "Discord message sends that failed.")
+cycle_seconds = Histogram("ditto_news_cycle_seconds", "Duration of one news cycle step.", ("step",))
+
+# serves /metrics on METRICS_HOST:METRICS_PORT, returns the aiohttp runner (None when disabled)
+async def start_server():
+    if not ENABLED:
+        return None
+    from aiohttp import web
+
+    async def handle_metrics(request):
+        return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, METRICS_HOST, METRICS_PORT).start()
+    logger.info(f"Serving metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    return runner
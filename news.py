@@ -0,0 +1,204 @@
+import os
+import re
+import asyncio
+import logging
+import functools
+import multiprocessing
+import cache
+import feeds
+import extractors
+import http_client
+import metrics
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger("dittologger")
+
+PARSER_ENGINE = os.getenv("PARSER_ENGINE", "auto")
+# how many sources are fetched at the same time
+SOURCE_CONCURRENCY = int(os.getenv("SOURCE_CONCURRENCY", "4"))
+ENRICH_CONCURRENCY = 4
+# parse stage: pages are parsed in this many worker processes, so a big page never blocks the
+# event loop or holds the GIL; only the extracted tuples come back. 0 parses in-process on a thread
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "2"))
+
+# first paragraphs of article pages, fetched once per article rather than once per channel
+paragraph_cache = cache.TTLCache(max_size=512, ttl=6 * 60 * 60)
+# WordPress thumbnails end in -<width>x<height>.<ext>; without the suffix it's the full-size upload
+THUMBNAIL_SUFFIX = re.compile(r'-\d+x\d+(\.[a-zA-Z]+)$')
+# image url as listed -> url to post (the full-size one if it exists, else the listed one)
+image_cache = cache.LRUCache(max_size=int(os.getenv("IMAGE_CACHE_SIZE", "1024")))
+
+_source_semaphore = None
+_parse_pool = None
+
+def _get_source_semaphore():
+    global _source_semaphore
+    if _source_semaphore is None:
+        _source_semaphore = asyncio.Semaphore(SOURCE_CONCURRENCY)
+    return _source_semaphore
+
+def _get_parse_pool():
+    global _parse_pool
+    if _parse_pool is None and PARSE_WORKERS > 0:
+        # forkserver: workers fork from a clean server process instead of this one, whose
+        # executor threads may hold locks mid-fork. the server preloads the parsers (bs4 and lxml
+        # too when installed) so workers start warm, and skips the bot's main module
+        methods = multiprocessing.get_all_start_methods()
+        context = None
+        if "forkserver" in methods:
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["extractors", "feeds", "bs4", "lxml.etree"])
+        _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=context)
+    return _parse_pool
+
+def shutdown_parse_pool():
+    global _parse_pool
+    pool, _parse_pool = _parse_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+# runs a parse function (extractors.*, feeds.parse_feed) in the parse stage
+async def parse(func, *args):
+    loop = asyncio.get_running_loop()
+    call = functools.partial(func, *args)
+    try:
+        return await loop.run_in_executor(_get_parse_pool(), call)
+    except BrokenProcessPool:
+        # a worker died (e.g. out of memory on a huge page): start a fresh pool next time
+        # and parse this page in-process so it isn't lost
+        logger.error("Parse worker died, restarting the parse pool.")
+        shutdown_parse_pool()
+        return await loop.run_in_executor(None, call)
+
+# fetch a source's RSS/Atom feed, returns (status, [(title, link, image_url, paragraph), ...]).
+# status is NOT_MODIFIED when the feed hasn't changed and None when it couldn't be read
+async def fetch_feed_articles(source):
+    start_marker, end_marker = feeds.SECTION_MARKERS
+    try:
+        async with _get_source_semaphore():
+            status, body = await http_client.fetch_if_changed(source.feed_url, start_marker, end_marker)
+        if status == http_client.NOT_MODIFIED:
+            logger.info(f"{source.feed_url} unchanged since last check, skipping parse.")
+            return status, []
+        if status != 200:
+            logger.error(f"Error fetching the feed: {source.feed_url}. Status code: {status}")
+            return None, []
+        with metrics.parse_seconds.time("feed"):
+            articles = await parse(feeds.parse_feed, body)
+    except Exception as e:
+        logger.error(f"Error while reading feed {source.feed_url}: {e}")
+        return None, []
+
+    logger.info(f"Fetched {len(articles)} articles from {source.feed_url}.")
+    return status, articles
+
+# fetch a source's articles, from its feed when it has one and from the listing page otherwise
+# (or when the feed is broken). feed articles already carry their paragraph in article[3].
+# returns (status, articles) like the two fetchers below, status is None when neither worked
+async def fetch_source_articles(source):
+    if source.feed_url:
+        status, articles = await fetch_feed_articles(source)
+        if status is not None and (articles or status == http_client.NOT_MODIFIED):
+            return status, articles
+        logger.warning(f"Falling back to scraping {source.url} for {source.label} news.")
+    return await fetch_listing_articles(source)
+
+# fetch a source's listing page, returns (status, [(title, link, image_url), ...]).
+# status is NOT_MODIFIED when the page hasn't changed and None when it couldn't be read
+async def fetch_listing_articles(source):
+    start_marker, end_marker = source.section_markers
+    try:
+        async with _get_source_semaphore():
+            status, body = await http_client.fetch_if_changed(source.url, start_marker, end_marker)
+        if status == http_client.NOT_MODIFIED:
+            logger.info(f"{source.url} unchanged since last check, skipping parse.")
+            return status, []
+        logger.info(f"fetch_listing_articles: GET {source.url} -> {status} (len={len(body) if body else 0})")
+        # 403 check bcs some of these websites are playing games
+        if status == 403:
+            logger.error(f"403 received; response snippet: {body[:1000]!r}")
+            return None, []
+        if status != 200:
+            logger.error(f"Error fetching the webpage: {source.url}. Status code: {status}")
+            return None, []
+    except Exception as e:
+        logger.error(f"Request error while fetching {source.url}: {e}")
+        return None, []
+
+    with metrics.parse_seconds.time("listing"):
+        fetched_articles = await parse(extractors.extract_articles, body, source.selectors, PARSER_ENGINE)
+
+    logger.info(f"Fetched {len(fetched_articles)} articles from {source.url}.")
+    return status, fetched_articles
+
+async def fetch_first_paragraph(url):
+    try:
+        status, body = await http_client.fetch(url)
+        if status != 200:
+            logger.error(f"Error fetching the webpage: {url}. Status code: {status}")
+            return ""
+    except Exception as e:
+        logger.error(f"Request error while fetching {url}: {e}")
+        return ""
+
+    with metrics.parse_seconds.time("paragraph"):
+        paragraph = await parse(extractors.extract_first_paragraph, body, PARSER_ENGINE)
+    if paragraph:
+        return paragraph
+
+    logger.warning(f"No suitable <p> tag found in the article {url}.")
+    return "No content available."
+
+# enrich articles once before fan-out: fills the pre-fetched paragraph slot (article[3]) and
+# swaps the image (article[2]) for its full-size version when there is one
+async def enrich_articles(articles):
+    semaphore = asyncio.Semaphore(ENRICH_CONCURRENCY)
+
+    async def paragraph_for(link):
+        paragraph = paragraph_cache.get(link)
+        if paragraph is None:
+            async with semaphore:
+                paragraph = await fetch_first_paragraph(link)
+            if paragraph:
+                paragraph_cache.set(link, paragraph)
+        return paragraph
+
+    async def enrich(article):
+        title, link, image_url = article[:3]
+        paragraph = article[3] if len(article) > 3 else None
+        if paragraph:
+            image_url = await resolve_image(image_url, semaphore)
+        else:
+            paragraph, image_url = await asyncio.gather(paragraph_for(link), resolve_image(image_url, semaphore))
+        return (title, link, image_url, paragraph)
+
+    return list(await asyncio.gather(*(enrich(article) for article in articles)))
+
+# GETS the url to post for an article image: the full-size version when a HEAD request finds it,
+# otherwise the image as listed. resolved once per image and remembered in image_cache
+async def resolve_image(image_url, semaphore):
+    if not image_url:
+        return image_url
+    full_size_url = THUMBNAIL_SUFFIX.sub(r'\1', image_url)
+    if full_size_url == image_url:
+        return image_url
+    resolved = image_cache.get(image_url)
+    if resolved is not None:
+        return resolved
+
+    try:
+        async with semaphore:
+            status, headers = await http_client.head(full_size_url)
+    except Exception as e:
+        # don't remember a network error, the next article with this image tries again
+        logger.error(f"Error checking full size image {full_size_url}: {e}")
+        return image_url
+
+    content_type = headers.get('Content-Type', '')
+    resolved = full_size_url if status == 200 and content_type.startswith('image/') else image_url
+    if resolved == image_url:
+        logger.info(f"No full size image at {full_size_url} (status {status}), keeping {image_url}.")
+    image_cache.set(image_url, resolved)
+    return resolved
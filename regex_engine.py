@@ -0,0 +1,473 @@
+import re
+import time
+import asyncio
+import logging
+import functools
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+import metrics
+from cache import LRUCache, TTLCache
+
+logger = logging.getLogger("dittologger")
+
+REGEX_FLAGS = re.IGNORECASE
+
+# compiles a guild pattern with the flags used for message matching.
+# raises re.error if the pattern is invalid
+def compile_pattern(pattern):
+    return re.compile(pattern, REGEX_FLAGS)
+
+# static complexity check run by /setregex and /addrule before a pattern is accepted, and on
+# stored patterns before they are compiled for matching. it rejects the shapes that backtrack
+# catastrophically; REGEX_MODE=sandbox is what bounds everything it can't see
+MAX_PATTERN_LENGTH = 500
+# nested repeats whose counts multiply to this or more backtrack like unbounded ones
+LARGE_REPEAT = 16
+# how many variable-length repeats over overlapping characters may follow each other;
+# every extra one multiplies the ways a failing match can be split up by the message length
+MAX_ADJACENT_QUANTIFIERS = 2
+
+# characters the checks use to tell whether two parts of a pattern can match the same text
+_SAMPLE_CHARS = [chr(c) for c in range(9, 127)] + ["\u00a0", "\u00e9", "\u00df", "\u0663", "\u4e00"]
+_CATEGORIES = {
+    sre_parse.CATEGORY_DIGIT: str.isdigit,
+    sre_parse.CATEGORY_NOT_DIGIT: lambda c: not c.isdigit(),
+    sre_parse.CATEGORY_SPACE: str.isspace,
+    sre_parse.CATEGORY_NOT_SPACE: lambda c: not c.isspace(),
+    sre_parse.CATEGORY_WORD: lambda c: c.isalnum() or c == "_",
+    sre_parse.CATEGORY_NOT_WORD: lambda c: not (c.isalnum() or c == "_"),
+}
+
+def _max_count(av):
+    return float("inf") if av[1] == sre_parse.MAXREPEAT else av[1]
+
+def _in_set(av, char):
+    matched = False
+    negate = False
+    for in_op, in_av in av:
+        if in_op is sre_parse.NEGATE:
+            negate = True
+        elif in_op is sre_parse.LITERAL:
+            matched = matched or char == chr(in_av).lower()
+        elif in_op is sre_parse.RANGE:
+            matched = matched or any(in_av[0] <= ord(c) <= in_av[1] for c in (char, char.upper()) if len(c) == 1)
+        elif in_op is sre_parse.CATEGORY:
+            matched = matched or _CATEGORIES.get(in_av, lambda c: True)(char)
+        else:
+            matched = True
+    return matched != negate
+
+# lowercase characters (of _SAMPLE_CHARS, plus literals) a parsed sequence can consume
+def _chars(items):
+    chars = set()
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            chars.add(chr(av).lower())
+        elif op is sre_parse.NOT_LITERAL:
+            chars.update(c.lower() for c in _SAMPLE_CHARS if c.lower() != chr(av).lower())
+        elif op is sre_parse.IN:
+            chars.update(c.lower() for c in _SAMPLE_CHARS if _in_set(av, c.lower()))
+            chars.update(chr(in_av).lower() for in_op, in_av in av if in_op is sre_parse.LITERAL)
+        elif op is sre_parse.SUBPATTERN:
+            chars |= _chars(av[-1])
+        elif op in _REPEATS:
+            chars |= _chars(av[2])
+        elif op is sre_parse.BRANCH:
+            for branch in av[1]:
+                chars |= _chars(branch)
+        elif op in (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            continue  # zero width
+        else:
+            chars.update(c.lower() for c in _SAMPLE_CHARS if c != "\n")
+    return chars
+
+# a sequence with plain groups spliced in, as (is a repeat, min width, max width, chars) per item
+def _flatten(items):
+    flat = []
+    for op, av in items:
+        if op is sre_parse.SUBPATTERN:
+            flat.extend(_flatten(av[-1]))
+            continue
+        low, high = sre_parse.SubPattern(items.state, [(op, av)]).getwidth()
+        flat.append((op in _REPEATS, low, high, _chars([(op, av)])))
+    return flat
+
+# too many variable-length repeats in a row over characters they could trade, e.g. `(a+)(a+)(a+)`
+def _adjacent_risk(items):
+    runs = []  # (quantifiers in the run, chars they can match) for runs still open at this point
+    for repeat, low, high, chars in _flatten(items):
+        if repeat and high - low > 1:
+            extended = [(count + 1, run_chars | chars) for count, run_chars in runs if run_chars & chars]
+            if any(count > MAX_ADJACENT_QUANTIFIERS for count, _ in extended):
+                return "more than two repeats in a row over the same characters such as `(a+)(a+)(a+)` are not allowed"
+            # a repeat that may match nothing doesn't separate the repeats around it
+            kept = [run for run in runs if not run[1] & chars] if low == 0 else []
+            runs = extended + kept + [(1, chars)]
+        elif low > 0:
+            # a required part ends the runs that can't absorb its characters
+            runs = [run for run in runs if run[1] & chars]
+    return None
+
+# True if every pass through a repeated body must consume a character none of its variable parts
+# can, so repeats inside it can't trade text between iterations (e.g. `(\d{1,3}\.){3}`)
+def _delimited(items):
+    flat = _flatten(items)
+    variable = set()
+    for _, low, high, chars in flat:
+        if high != low:
+            variable |= chars
+    return any(low == high > 0 and not chars & variable for _, low, high, chars in flat)
+
+# outer_count: product of the counts of the enclosing repeats whose iterations can trade text,
+# repeat_count: product of the counts of all enclosing repeats, separated or not
+def _find_backtracking_risk(items, outer_count=1, repeat_count=1):
+    reason = _adjacent_risk(items)
+    if reason:
+        return reason
+    for op, av in items:
+        if op in _REPEATS:
+            count = _max_count(av)
+            # any variable repeat counts, `?` included: (x?){20} has 2 ** 20 ways to match 10 x's
+            if outer_count > 1 and av[0] != av[1] and outer_count * max(count, 2) >= LARGE_REPEAT:
+                return "nested quantifiers such as `(a+)+` or `(a{1,20}){1,20}` are not allowed"
+            inner_count = outer_count * count if count > 1 and not _delimited(av[2]) else outer_count
+            reason = _find_backtracking_risk(av[2], inner_count, repeat_count * count)
+            if reason:
+                return reason
+        elif op is sre_parse.SUBPATTERN:
+            reason = _find_backtracking_risk(av[-1], outer_count, repeat_count)
+            if reason:
+                return reason
+        elif op is sre_parse.BRANCH:
+            # checked under any large repeat, separated or not: `(a|a)*` parses as `a(?:|)*`, whose
+            # required `a` would otherwise pass for a separator
+            if repeat_count >= LARGE_REPEAT:
+                seen = set()
+                for index, branch in enumerate(av[1]):
+                    # an alternative that can match nothing overlaps every other one
+                    chars = None if branch.getwidth()[0] == 0 else _first_chars(branch)
+                    # a branch that may start with anything overlaps every other branch
+                    if (chars is None and len(av[1]) > 1) or (index and (seen is None or chars & seen)):
+                        return "overlapping alternatives inside a repeat such as `(a|ab)+` are not allowed"
+                    seen = None if chars is None else seen | chars
+            for branch in av[1]:
+                reason = _find_backtracking_risk(branch, outer_count, repeat_count)
+                if reason:
+                    return reason
+    return None
+
+# first characters a parsed sequence can start with, or None if unknown/any
+def _first_chars(items):
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            return {chr(av).lower()}
+        if op is sre_parse.IN:
+            chars = set()
+            for in_op, in_av in av:
+                if in_op is sre_parse.LITERAL:
+                    chars.add(chr(in_av).lower())
+                elif in_op is sre_parse.RANGE and in_av[1] - in_av[0] < 256:
+                    chars.update(chr(c).lower() for c in range(in_av[0], in_av[1] + 1))
+                else:
+                    return None
+            return chars
+        if op is sre_parse.SUBPATTERN:
+            return _first_chars(av[-1])
+        if op is sre_parse.AT:
+            continue
+        return None
+    return None
+
+# returns None if the pattern looks safe, otherwise a short reason it was rejected
+def check_complexity(pattern):
+    if len(pattern) > MAX_PATTERN_LENGTH:
+        return f"patterns are limited to {MAX_PATTERN_LENGTH} characters"
+    try:
+        parsed = sre_parse.parse(pattern, REGEX_FLAGS)
+    except Exception:
+        return None  # compile_pattern reports invalid patterns
+    return _find_backtracking_risk(parsed)
+
+# shortest literal worth indexing; anything shorter would let nearly every message through
+MIN_LITERAL_LENGTH = 3
+# above this many literals the prefilter switches from substring checks to a trigram index
+TRIGRAM_INDEX_THRESHOLD = 16
+
+# the only non-ASCII characters IGNORECASE treats as equal to an ASCII letter but that
+# str.lower() doesn't map onto it
+_FOLD_TABLE = str.maketrans({"\u0130": "i", "\u0131": "i", "\u017f": "s"})
+
+_REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, getattr(sre_parse, "POSSESSIVE_REPEAT", None))
+
+def _fold(text):
+    return text.translate(_FOLD_TABLE).lower()
+
+# returns a set of lowercase literals such that every match of the parsed pattern contains
+# at least one of them, or None if no useful literal can be proven
+def _required_literals(items):
+    best = None
+
+    def consider(literals):
+        nonlocal best
+        if not literals or min(map(len, literals)) < MIN_LITERAL_LENGTH:
+            return
+        if best is None or (min(map(len, literals)), -len(literals)) > (min(map(len, best)), -len(best)):
+            best = literals
+
+    run = []
+    for op, av in items:
+        if op is sre_parse.LITERAL and av < 128:
+            run.append(chr(av))
+            continue
+
+        consider({"".join(run).lower()})
+        run = []
+        if op is sre_parse.SUBPATTERN:
+            consider(_required_literals(av[-1]))
+        elif op is sre_parse.BRANCH:
+            branches = [_required_literals(branch) for branch in av[1]]
+            if all(branches):
+                consider(set().union(*branches))
+        elif op in _REPEATS and av[0] >= 1:
+            consider(_required_literals(av[2]))
+    consider({"".join(run).lower()})
+    return best
+
+def required_literals(pattern):
+    try:
+        return _required_literals(sre_parse.parse(pattern, REGEX_FLAGS))
+    except Exception:
+        return None
+
+# all of a guild's rules behind a literal prefilter: each rule's required literals are indexed
+# once, a message is scanned once for them, and only rules whose literal appeared are run.
+# with many rules the scan is a trigram lookup, so cost follows message length, not rule count
+class RuleMatcher:
+    def __init__(self, rules):
+        # rules: {name: (pattern, reply)}
+        self._rules = []
+        self._always = []
+        self._literals = {}  # {literal: [rule index, ...]}
+
+        for name, (pattern, reply) in sorted(rules.items()):
+            # rules stored before the complexity check existed (or got stricter) are checked again here
+            reason = check_complexity(pattern)
+            if reason:
+                logger.error(f"Regex rule {name} skipped, {reason}: {pattern}")
+                continue
+            try:
+                compiled = compile_pattern(pattern)
+            except re.error as e:
+                logger.error(f"Regex rule {name} failed to compile: {e}")
+                continue
+
+            index = len(self._rules)
+            self._rules.append((name, reply, compiled))
+            literals = required_literals(pattern)
+            if literals is None:
+                self._always.append(index)
+            else:
+                for literal in literals:
+                    self._literals.setdefault(literal, []).append(index)
+
+        # index each literal under its rarest trigram so buckets stay small
+        self._trigrams = None
+        if len(self._literals) > TRIGRAM_INDEX_THRESHOLD:
+            frequency = {}
+            for literal in self._literals:
+                for gram in _trigrams(literal):
+                    frequency[gram] = frequency.get(gram, 0) + 1
+            self._trigrams = {}
+            for literal in self._literals:
+                gram = min(_trigrams(literal), key=lambda g: (frequency[g], g))
+                self._trigrams.setdefault(gram, []).append(literal)
+
+    def _candidates(self, content):
+        folded = _fold(content)
+        if self._trigrams is None:
+            literals = [literal for literal in self._literals if literal in folded]
+        else:
+            grams = _trigrams(folded)
+            literals = [literal for gram in self._trigrams.keys() & grams
+                        for literal in self._trigrams[gram] if literal in folded]
+
+        candidates = set(self._always)
+        for literal in literals:
+            candidates.update(self._literals[literal])
+        return sorted(candidates)
+
+    # GETS (rule name, reply, compiled pattern) for every rule the prefilter let through, in rule order
+    def candidates(self, content):
+        return [self._rules[index] for index in self._candidates(content)]
+
+    # returns (rule name, reply) for the first matching rule, or None
+    def match(self, content):
+        for name, reply, compiled in self.candidates(content):
+            if compiled.search(content):
+                return name, reply
+        return None
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+# compiled-pattern store keyed by guild, so on_message never depends on re's internal cache.
+# each entry remembers the pattern text it was built from; if the guild's pattern changed
+# (a newer version) the stale entry is recompiled on the next lookup
+class PatternRegistry(LRUCache):
+    def __init__(self, max_size=10000):
+        super().__init__(max_size)
+
+    # COMPILES and stores a pattern, used by /setregex to validate and register in one step
+    def register(self, server_id, pattern):
+        compiled = compile_pattern(pattern)
+        self.set(server_id, (pattern, compiled))
+        return compiled
+
+    # GETS the compiled pattern for a guild's current pattern text
+    def get_compiled(self, server_id, pattern):
+        entry = self.get(server_id)
+        if entry is not None and entry[0] == pattern:
+            return entry[1]
+
+        reason = check_complexity(pattern)
+        if reason:
+            logger.error(f"Stored regex pattern for server {server_id} disabled, {reason}: {pattern}")
+            compiled = None
+        else:
+            try:
+                compiled = compile_pattern(pattern)
+            except re.error as e:
+                logger.error(f"Stored regex pattern for server {server_id} failed to compile: {e}")
+                compiled = None
+        self.set(server_id, (pattern, compiled))
+        return compiled
+
+    # REMOVES a guild's compiled pattern, used by /removeregex
+    def invalidate(self, server_id):
+        self.pop(server_id)
+
+# compiled rule matchers keyed by guild and the version of its rule set
+class RuleMatcherRegistry(LRUCache):
+    def __init__(self, max_size=10000):
+        super().__init__(max_size)
+
+    # GETS the matcher for a guild config, rebuilding it when the rules changed
+    def get_matcher(self, server_id, config):
+        entry = self.get(server_id)
+        if entry is not None and entry[0] == config.rules_version:
+            return entry[1]
+
+        matcher = RuleMatcher(config.rules)
+        self.set(server_id, (config.rules_version, matcher))
+        return matcher
+
+# runs in the worker processes; patterns are recompiled once per worker and reused
+@functools.lru_cache(maxsize=1024)
+def _worker_compile(pattern, flags):
+    return re.compile(pattern, flags)
+
+def _worker_search(pattern, flags, content):
+    return _worker_compile(pattern, flags).search(content) is not None
+
+# evaluates guild patterns with a per-match time budget.
+# "inline" runs on the event loop and can only quarantine a slow pattern after the fact,
+# "sandbox" runs every match in a worker process that is killed when the budget runs out,
+# so the loop's responsiveness never depends on a guild's pattern
+class RegexRunner:
+    def __init__(self, mode="sandbox", timeout=0.05, workers=2, quarantine_strikes=3, strike_ttl=3600):
+        if mode not in ("inline", "sandbox"):
+            raise ValueError(f"Unknown regex mode: {mode}")
+        self.mode = mode
+        self.timeout = timeout
+        self.workers = workers
+        self.quarantine_strikes = quarantine_strikes
+        # strikes (and so a quarantine) expire strike_ttl seconds after a pattern's last slow match
+        self._strikes = TTLCache(max_size=10000, ttl=strike_ttl)  # {(server_id, pattern): strikes}
+        self._pool = None
+        # at most one match per worker is in flight, so the budget only runs while a worker is on it
+        # and a burst of messages waits here instead of in the pool's queue
+        self._slots = None
+        self.timeouts = 0
+        self.quarantined = 0
+
+    def _get_pool(self):
+        if self._pool is None:
+            # fork so workers don't re-import the bot's main module
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("fork") if "fork" in methods else None
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return self._pool
+
+    # KILLS the pool, the only way to stop a match that is stuck backtracking
+    def _reset_pool(self):
+        pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        for process in list((pool._processes or {}).values()):
+            process.kill()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self):
+        self._reset_pool()
+
+    def is_quarantined(self, server_id, pattern):
+        return (self._strikes.get((server_id, pattern)) or 0) >= self.quarantine_strikes
+
+    def _strike(self, server_id, pattern, elapsed):
+        key = (server_id, pattern)
+        strikes = (self._strikes.get(key) or 0) + 1
+        self._strikes.set(key, strikes)
+        self.timeouts += 1
+        metrics.regex_timeouts.inc()
+        logger.warning(f"Regex for server {server_id} exceeded its {self.timeout * 1000:.0f}ms budget ({elapsed * 1000:.0f}ms, strike {strikes}).")
+        if strikes == self.quarantine_strikes:
+            self.quarantined += 1
+            logger.error(f"Regex for server {server_id} quarantined after {strikes} slow matches: {pattern}")
+
+    # returns True if the compiled pattern matches the content within the time budget
+    async def search(self, server_id, compiled, content):
+        if self.is_quarantined(server_id, compiled.pattern):
+            return False
+
+        if self.mode == "inline":
+            start = time.perf_counter()
+            matched = compiled.search(content) is not None
+            elapsed = time.perf_counter() - start
+            metrics.regex_seconds.observe(elapsed, "inline")
+            if elapsed > self.timeout:
+                self._strike(server_id, compiled.pattern, elapsed)
+            return matched
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        # a match killed along with another guild's slow one is run again once on the new pool
+        for attempt in range(2):
+            async with self._slots:
+                start = time.perf_counter()
+                future = self._get_pool().submit(_worker_search, compiled.pattern, compiled.flags, content)
+                try:
+                    matched = await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+                    metrics.regex_seconds.observe(time.perf_counter() - start, "sandbox")
+                    return matched
+                except asyncio.TimeoutError:
+                    self._strike(server_id, compiled.pattern, time.perf_counter() - start)
+                    self._reset_pool()
+                    return False
+                except BrokenProcessPool:
+                    self._reset_pool()
+                except asyncio.CancelledError:
+                    # the pool was shut down under this match; anything else is our own cancellation
+                    if not future.cancelled():
+                        raise
+        return False
+
+    def stats(self):
+        return {"mode": self.mode, "timeouts": self.timeouts, "quarantined": self.quarantined}
@@ -0,0 +1,130 @@
+import os
+import time
+import socket
+import asyncio
+import logging
+import async_database
+import http_client
+import news
+import sources
+
+logger = logging.getLogger("dittologger")
+
+# how often the scraper checks which sources are due for a poll
+POLL_TICK_SECONDS = 60
+# only the holder of this lease scrapes; it is renewed every tick and expires after a few
+# missed ones, so a crashed scraper is replaced by another process within LEASE_SECONDS
+LEASE_NAME = "news_scraper"
+LEASE_SECONDS = 3 * POLL_TICK_SECONDS
+LEASE_HOLDER = f"{socket.gethostname()}:{os.getpid()}"
+
+_is_leader = False
+
+# polls one news source and appends its new articles to the article log.
+# returns how many of its articles were new, or None if the source couldn't be fetched or its
+# articles couldn't be staged; only then does the change tracker keep what it saw of the pages
+async def poll_source(source):
+    urls = [url for url in (source.feed_url, source.url) if url]
+    try:
+        new_articles = await stage_new_articles(source)
+    except Exception:
+        for url in urls:
+            http_client.change_tracker.discard(url)
+        raise
+    for url in urls:
+        if new_articles is None:
+            http_client.change_tracker.discard(url)
+        else:
+            http_client.change_tracker.commit(url)
+    return new_articles
+
+async def stage_new_articles(source):
+    status, all_articles = await news.fetch_source_articles(source)
+    if status is None:
+        return None
+    if not all_articles:
+        return 0
+
+    new_links = await async_database.filter_new_links([article_data[1] for article_data in all_articles])
+    if new_links is None:
+        return None
+    new_links = set(new_links)
+    new_articles = [article_data for article_data in all_articles if article_data[1] in new_links]
+    if not new_articles:
+        return 0
+    subscriptions = await async_database.get_subscriptions(source.name)
+    if subscriptions is None:
+        return None
+    if not subscriptions:
+        # nothing is staged, so these stay "new"; counting them would speed up a source nobody reads
+        return 0
+
+    new_articles = await news.enrich_articles(new_articles)
+    if not await async_database.stage_articles(source.name, new_articles):
+        return None
+    return len(new_articles)
+
+# reschedules a source after a poll (see sources.NewsSource) and logs when it will run next
+def reschedule(source, new_articles, now):
+    if new_articles is None:
+        source.record_failure(now)
+        if source.circuit_open:
+            logger.warning(f"{source.label} failed {source.failures} polls in a row, "
+                           f"pausing it for {(source.next_poll - now) / 60:.0f} minutes.")
+        else:
+            logger.warning(f"{source.label} poll failed, retrying in {(source.next_poll - now) / 60:.0f} minutes.")
+        return
+    source.record_success(new_articles, now)
+    logger.info(f"{source.label}: {new_articles} new articles, next poll in {(source.next_poll - now) / 60:.0f} minutes.")
+
+# polls all sources that are due concurrently, returns True if any source was polled
+async def poll_due_sources():
+    now = time.time()
+    due = [source for source in sources.SOURCES.values() if source.is_due(now)]
+    if not due:
+        return False
+
+    logger.info(f"Running check for new articles from {', '.join(source.label for source in due)}...")
+    for source in due:
+        source.mark_polled(now)
+    results = await asyncio.gather(*(poll_source(source) for source in due), return_exceptions=True)
+    finished = time.time()
+    for source, result in zip(due, results):
+        if isinstance(result, Exception):
+            logger.error(f"Error while polling {source.label}: {result}")
+            result = None
+        reschedule(source, result, finished)
+    await async_database.save_source_schedules([source.schedule_state() for source in due])
+
+    logger.info(f"Paragraph cache stats: {news.paragraph_cache.stats()}")
+    logger.info(f"Conditional fetch stats: {http_client.change_tracker.stats()}")
+    logger.info("Finished check.")
+    return True
+
+# picks up the schedule the previous scraper left, so a restart or failover doesn't re-poll everything
+async def load_schedules():
+    saved = await async_database.get_source_schedules()
+    for name, state in saved.items():
+        source = sources.get(name)
+        if source is not None:
+            source.restore_schedule(*state)
+    if saved:
+        logger.info(f"Restored the poll schedule of {len(saved)} news sources.")
+
+# takes or renews the scraper lease, returns True while this process is the scraper
+async def hold_lease():
+    global _is_leader
+    leader = await async_database.acquire_lease(LEASE_NAME, LEASE_HOLDER, LEASE_SECONDS)
+    if leader != _is_leader:
+        logger.info(f"{LEASE_HOLDER} {'is now' if leader else 'is no longer'} the news scraper.")
+        _is_leader = leader
+        if leader:
+            await load_schedules()
+    return leader
+
+# gives the lease up on shutdown so the next scraper doesn't wait for it to expire
+async def release_lease():
+    global _is_leader
+    if _is_leader:
+        await async_database.release_lease(LEASE_NAME, LEASE_HOLDER)
+        _is_leader = False
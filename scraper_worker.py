@@ -0,0 +1,59 @@
+"""Standalone news scraper.
+
+Polls the news sources, enriches new articles and appends them to the article log in
+bot_data.db, without a Discord connection. Run it next to bot processes started with
+SCRAPER_MODE=external, which then only deliver. Several workers can be started safely:
+they elect a single scraper through the SQLite lease, and the others stand by.
+
+Usage: python scraper_worker.py
+"""
+import signal
+import asyncio
+import logging
+import log_setup
+import metrics
+import database
+import async_database
+import scraper
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+log_file = "scraper_activity.log"
+logger = logging.getLogger("dittologger")
+
+async def run():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop.set)
+
+    metrics_server = await metrics.start_server()
+    logger.info(f"Scraper worker {scraper.LEASE_HOLDER} started.")
+    try:
+        while not stop.is_set():
+            if await scraper.hold_lease():
+                with metrics.cycle_seconds.time("scrape"):
+                    await scraper.poll_due_sources()
+            try:
+                await asyncio.wait_for(stop.wait(), scraper.POLL_TICK_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await scraper.release_lease()
+        if metrics_server is not None:
+            await metrics_server.cleanup()
+        logger.info(f"Scraper worker {scraper.LEASE_HOLDER} stopped.")
+
+def main():
+    # set up here, not at import: the feed parse workers import this module again
+    log_setup.setup_logging(logger, log_file)
+    database.setup_database()
+    try:
+        asyncio.run(run())
+    finally:
+        async_database.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Runs a sharded cluster of Ditto on one host.
+
+Starts one ditto.py process per group of shards, each with its own SHARD_COUNT and
+SHARD_IDS, all sharing bot_data.db. Whichever process holds the news_scraper lease
+scrapes the news (or scraper_worker.py does, with SCRAPER_MODE=external); every
+process delivers it to the guilds on its own shards.
+
+Usage: python shard_launcher.py --shards 8 --processes 4
+"""
+import os
+import sys
+import signal
+import argparse
+import subprocess
+
+def shard_groups(shard_count, processes):
+    processes = max(1, min(processes, shard_count))
+    return [list(range(shard_count))[index::processes] for index in range(processes)]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shards", type=int, required=True, help="total shard count of the bot")
+    parser.add_argument("--processes", type=int, default=1, help="how many processes to split the shards across")
+    args = parser.parse_args()
+
+    bot_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ditto.py")
+    children = []
+    for shard_ids in shard_groups(args.shards, args.processes):
+        env = dict(os.environ, SHARD_COUNT=str(args.shards), SHARD_IDS=",".join(map(str, shard_ids)))
+        children.append(subprocess.Popen([sys.executable, bot_script], env=env))
+        print(f"Started shards {shard_ids} (pid {children[-1].pid})")
+
+    def stop(signum, frame):
+        for child in children:
+            child.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    exit_code = 0
+    for child in children:
+        exit_code = child.wait() or exit_code
+    sys.exit(exit_code)
+
+if __name__ == "__main__":
+    main()
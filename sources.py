@@ -0,0 +1,108 @@
+import os
+import time
+import random
+import extractors
+
+# default poll interval for every source, in minutes; where a source starts before its
+# publish rate is known
+NEWS_POLL_MINUTES = float(os.getenv("NEWS_POLL_MINUTES", "60"))
+# bounds of the adaptive poll interval, in minutes
+NEWS_POLL_MIN_MINUTES = float(os.getenv("NEWS_POLL_MIN_MINUTES", "10"))
+NEWS_POLL_MAX_MINUTES = float(os.getenv("NEWS_POLL_MAX_MINUTES", "180"))
+# random +/- share of the delay before each poll, so sources and restarted processes don't line up
+NEWS_POLL_JITTER = float(os.getenv("NEWS_POLL_JITTER", "0.1"))
+# circuit breaker: after this many failed polls in a row a source is only retried once per cooldown
+NEWS_BREAKER_FAILURES = int(os.getenv("NEWS_BREAKER_FAILURES", "5"))
+NEWS_BREAKER_COOLDOWN_MINUTES = float(os.getenv("NEWS_BREAKER_COOLDOWN_MINUTES", "360"))
+# weight of the latest poll in the smoothed publish rate
+RATE_SMOOTHING = 0.3
+
+# a news site the bot follows: where to fetch it, how to extract it and how often to poll it.
+# the poll interval follows the observed publish rate (about one new article per poll) between
+# the bounds above, and failed polls back off exponentially up to the circuit breaker cooldown
+class NewsSource:
+    def __init__(self, name, label, url, selectors, poll_minutes=None, section_markers=("<article", "</article>"),
+                 feed_url=None):
+        self.name = name                # key used in the subscriptions table
+        self.label = label              # shown in logs and commands
+        self.url = url
+        self.feed_url = feed_url        # RSS/Atom feed, preferred over scraping url when set
+        self.selectors = selectors      # extractors.ListingSelectors
+        self.section_markers = section_markers
+        self.min_interval = NEWS_POLL_MIN_MINUTES * 60
+        self.max_interval = NEWS_POLL_MAX_MINUTES * 60
+        self.poll_interval = self._bounded((poll_minutes or NEWS_POLL_MINUTES) * 60)
+        self.publish_rate = 1 / self.poll_interval  # new articles per second, smoothed
+        self.failures = 0                           # failed polls in a row
+        self.last_success = None                    # wall clock time of the last successful poll
+        self.next_poll = 0.0                        # wall clock time, so it survives restarts
+
+    def _bounded(self, interval):
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def _schedule(self, now, delay):
+        self.next_poll = now + delay * (1 + random.uniform(-NEWS_POLL_JITTER, NEWS_POLL_JITTER))
+
+    @property
+    def circuit_open(self):
+        return self.failures >= NEWS_BREAKER_FAILURES
+
+    def is_due(self, now=None):
+        return (now or time.time()) >= self.next_poll
+
+    # pushes the next poll out while this one runs, record_success/record_failure reschedule it
+    def mark_polled(self, now=None):
+        self.next_poll = (now or time.time()) + self.poll_interval
+
+    def record_success(self, new_articles, now=None):
+        now = now or time.time()
+        # the first poll after a start also returns whatever was published while nobody looked
+        if self.last_success is not None:
+            observed_rate = new_articles / max(now - self.last_success, 1.0)
+            self.publish_rate += RATE_SMOOTHING * (observed_rate - self.publish_rate)
+        self.last_success = now
+        self.failures = 0
+        self.poll_interval = self._bounded(1 / self.publish_rate if self.publish_rate > 0 else self.max_interval)
+        self._schedule(now, self.poll_interval)
+
+    def record_failure(self, now=None):
+        now = now or time.time()
+        self.failures += 1
+        cooldown = NEWS_BREAKER_COOLDOWN_MINUTES * 60
+        self._schedule(now, cooldown if self.circuit_open else min(self.poll_interval * 2 ** self.failures, cooldown))
+
+    # (source, next_poll, poll_interval, publish_rate, failures, last_success) as stored in the database
+    def schedule_state(self):
+        return (self.name, self.next_poll, self.poll_interval, self.publish_rate, self.failures, self.last_success)
+
+    def restore_schedule(self, next_poll, poll_interval, publish_rate, failures, last_success):
+        self.next_poll = next_poll
+        self.poll_interval = self._bounded(poll_interval)
+        self.publish_rate = publish_rate
+        self.failures = failures
+        self.last_success = last_success
+
+SOURCES = {}
+
+def register(source):
+    SOURCES[source.name] = source
+    return source
+
+def get(name):
+    return SOURCES.get(name)
+
+register(NewsSource(
+    name="ptcg",
+    label="PTCG",
+    url="https://www.pokebeach.com/",
+    selectors=extractors.PTCG_LISTING,
+    feed_url="https://www.pokebeach.com/feed",
+))
+
+register(NewsSource(
+    name="pocket",
+    label="Pocket",
+    url="https://www.pokemon-zone.com/",
+    selectors=extractors.POCKET_LISTING,
+    section_markers=('<article class="featured-article-preview', "</article>"),
+))
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+
+logger = logging.getLogger("dittologger")
+
+# buffers records in memory and writes them in batches through an async flush function
+# (one executemany transaction per batch). a batch is written as soon as it reaches
+# max_batch records, or max_delay seconds after its first record, whichever comes first
+class WriteBehindQueue:
+    def __init__(self, flush_func, max_batch=200, max_delay=2.0):
+        self.flush_func = flush_func
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+        self.flushes = 0
+        self.records = 0
+
+    def add(self, record):
+        self._pending.append(record)
+        if len(self._pending) >= self.max_batch:
+            self._flush_later()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush_later)
+
+    def _flush_later(self):
+        task = asyncio.get_running_loop().create_task(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # takes every buffered record out of the queue without writing it,
+    # for callers that fold the last batch into a transaction of their own
+    def drain(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        return batch
+
+    async def flush(self):
+        batch = self.drain()
+        if not batch:
+            return
+        self.flushes += 1
+        self.records += len(batch)
+        try:
+            await self.flush_func(batch)
+        except Exception as e:
+            logger.error(f"Write-behind flush of {len(batch)} records failed: {e}")
+
+    # waits for in-flight flushes, then writes whatever is still buffered
+    async def close(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "records": self.records,
+            "avg_batch": round(self.records / self.flushes, 1) if self.flushes else 0.0,
+        }